@@ -0,0 +1,171 @@
+import logging
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import Complaint as DBComplaint
+from .history_models import HistoryComplaint, ArchiveOutbox
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_STATUS = "Forwarded to Bank"
+ARCHIVED_NOTES = "Automatically archived after forwarding to bank"
+
+# Tries at the live delete of one chunk before leaving it to the outbox
+DELETE_ATTEMPTS = 2
+
+# Columns copied verbatim from `complaints` into `history_complaints`
+COPIED_COLUMNS = [
+    c.name for c in HistoryComplaint.__table__.columns
+    if c.name in DBComplaint.__table__.columns
+]
+
+
+def _insert_ignore(table, dialect_name):
+    """INSERT that skips rows whose complaint_id is already present."""
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise ValueError(f"Unsupported history dialect: {dialect_name}")
+    return insert(table).on_conflict_do_nothing(index_elements=["complaint_id"])
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _delete_live(db: Session, complaint_ids):
+    db.execute(delete(DBComplaint.__table__).where(DBComplaint.complaint_id.in_(complaint_ids)))
+    db.commit()
+
+
+def _try_delete_live(db: Session, complaint_ids):
+    """_delete_live with an inline retry; False if every attempt failed."""
+    for attempt in range(1, DELETE_ATTEMPTS + 1):
+        try:
+            _delete_live(db, complaint_ids)
+            return True
+        except Exception as e:
+            db.rollback()
+            logger.warning("Live delete of %d archived complaint(s) failed (attempt %d/%d): %s",
+                           len(complaint_ids), attempt, DELETE_ATTEMPTS, e)
+    return False
+
+
+def _clear_outbox(history_db: Session, batch_id):
+    history_db.execute(delete(ArchiveOutbox.__table__).where(ArchiveOutbox.batch_id == batch_id))
+    history_db.commit()
+
+
+def _archive_chunk(db: Session, history_db: Session, complaint_ids, result):
+    live = DBComplaint.__table__
+    history = HistoryComplaint.__table__
+
+    # 1. One set-based read from the live DB
+    rows = db.execute(
+        select(*[live.c[name] for name in COPIED_COLUMNS]).where(live.c.complaint_id.in_(complaint_ids))
+    ).mappings().all()
+    found = {row["complaint_id"] for row in rows}
+    already = set(history_db.execute(
+        select(history.c.complaint_id).where(history.c.complaint_id.in_(complaint_ids))
+    ).scalars())
+
+    # Only live rows count: an id that is merely in history is not_found,
+    # as it was before the bulk path (single-complaint endpoint -> 404)
+    for cid in complaint_ids:
+        if cid not in found:
+            result["not_found"].append(cid)
+        elif cid in already:
+            result["already_archived"].append(cid)
+    if not found:
+        return
+
+    # 2. History rows + outbox entries commit together: a crash before this
+    #    commit leaves both databases untouched.
+    now = datetime.now()
+    batch_id = uuid.uuid4().hex
+    history_rows = [
+        {
+            **row,
+            "status": ARCHIVED_STATUS,
+            "resolution_date": now,
+            "resolution_notes": ARCHIVED_NOTES,
+        }
+        for row in rows if row["complaint_id"] not in already
+    ]
+    if history_rows:
+        history_db.execute(_insert_ignore(history, history_db.get_bind().dialect.name), history_rows)
+    history_db.execute(
+        ArchiveOutbox.__table__.insert(),
+        [{"batch_id": batch_id, "complaint_id": cid, "created_at": now} for cid in found],
+    )
+    history_db.commit()
+
+    # 3. Set-based delete from the live DB. If it keeps failing (or we
+    #    crash here) the outbox entries stay behind and the next archive
+    #    call or restart repeats the (idempotent) delete.
+    result["archived"].extend(cid for cid in complaint_ids if cid in found and cid not in already)
+    if not _try_delete_live(db, list(found)):
+        result["pending_delete"].extend(cid for cid in complaint_ids if cid in found)
+        return
+
+    # 4. Both sides done
+    _clear_outbox(history_db, batch_id)
+
+
+def archive_complaints(db: Session, history_db: Session, complaint_ids, chunk_size=None):
+    """
+    Move complaints from the live DB to history in chunks of `chunk_size`.
+
+    Per chunk: one SELECT on the live DB, one INSERT ... ON CONFLICT DO
+    NOTHING plus outbox write in a single history transaction, one DELETE
+    on the live DB. Complaints already in history are still removed from
+    the live DB and reported as "already_archived"; ids without a live
+    row are "not_found", whether or not history has them. Ids whose
+    history row committed but whose live delete failed are also listed
+    under "pending_delete"; batches left in the outbox by earlier calls
+    are replayed first.
+    """
+    chunk_size = chunk_size or settings.ARCHIVE_CHUNK_SIZE
+    ids = list(dict.fromkeys(complaint_ids))  # dedupe, keep order
+    result = {"archived": [], "already_archived": [], "not_found": [], "pending_delete": []}
+    try:
+        recover_pending_archives(db, history_db)
+    except Exception as e:
+        db.rollback()
+        history_db.rollback()
+        logger.warning("Archive outbox replay failed: %s", e)
+    for chunk in _chunks(ids, chunk_size):
+        try:
+            _archive_chunk(db, history_db, chunk, result)
+        except Exception:
+            db.rollback()
+            history_db.rollback()
+            raise
+    return result
+
+
+def recover_pending_archives(db: Session, history_db: Session):
+    """
+    Finish archive batches interrupted between the history commit and the
+    live delete. Returns the number of complaints recovered.
+    """
+    outbox = ArchiveOutbox.__table__
+    pending = history_db.execute(select(outbox.c.batch_id, outbox.c.complaint_id)).all()
+    if not pending:
+        return 0
+
+    batches = {}
+    for batch_id, cid in pending:
+        batches.setdefault(batch_id, []).append(cid)
+    for batch_id, cids in batches.items():
+        for chunk in _chunks(cids, settings.ARCHIVE_CHUNK_SIZE):
+            _delete_live(db, chunk)
+        _clear_outbox(history_db, batch_id)
+    return len(pending)
@@ -0,0 +1,166 @@
+import sys
+import time
+
+import pandas as pd
+from sqlalchemy import Column, Index, MetaData, Table, func, select, text
+from sqlalchemy.orm import Session
+
+import feature_store
+from .config import settings
+from .models import ATM
+from .atm_snapshot import bump_atm_master_version
+from .bulk_load import write_chunk, pick_column, as_int, as_float
+
+LIVE_TABLE = ATM.__tablename__
+SHADOW_TABLE = f"{LIVE_TABLE}_shadow"
+
+
+class AtmRefreshError(ValueError):
+    """The new ATM master failed validation; the live table is untouched."""
+
+
+def map_atm_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """ATM master CSV -> `atms` columns (accepts atm_* or suspected_atm_* names)."""
+    return pd.DataFrame({
+        "suspected_atm_index": as_int(pick_column(df, "atm_id", "suspected_atm_index")),
+        "suspected_atm_lat": as_float(pick_column(df, "atm_lat", "suspected_atm_lat")),
+        "suspected_atm_lon": as_float(pick_column(df, "atm_lon", "suspected_atm_lon")),
+        "suspected_atm_place": pick_column(df, "suspected_atm_place"),
+        "suspected_atm_name": pick_column(df, "suspected_atm_name"),
+        "atm_total_complaints": as_int(pick_column(df, "atm_total_complaints")),
+        "atm_avg_loss": as_float(pick_column(df, "atm_avg_loss")),
+    })
+
+
+def _index_specs():
+    """(column, unique) for every single-column index on `atms`."""
+    return [(list(idx.columns)[0].name, bool(idx.unique)) for idx in ATM.__table__.indexes]
+
+
+def _index_name(table_name, column):
+    # SQLAlchemy's default ix_<table>_<column> convention, as create_all uses
+    return f"ix_{table_name}_{column}"
+
+
+def _shadow_table():
+    """Same columns as `atms`, no indexes (built after the load)."""
+    return Table(
+        SHADOW_TABLE, MetaData(),
+        *[Column(c.name, c.type, primary_key=c.primary_key) for c in ATM.__table__.columns],
+    )
+
+
+def _validate(db: Session, shadow: Table):
+    loaded = db.execute(select(func.count()).select_from(shadow)).scalar()
+    live = db.execute(select(func.count()).select_from(ATM.__table__)).scalar()
+    if loaded < settings.ATM_REFRESH_MIN_ROWS:
+        raise AtmRefreshError(f"only {loaded} ATMs loaded (minimum {settings.ATM_REFRESH_MIN_ROWS})")
+    if live and loaded < live * (1.0 - settings.ATM_REFRESH_MAX_SHRINK):
+        raise AtmRefreshError(
+            f"{loaded} ATMs would replace {live}; more than "
+            f"{settings.ATM_REFRESH_MAX_SHRINK:.0%} shrink"
+        )
+
+    lat, lon = shadow.c.suspected_atm_lat, shadow.c.suspected_atm_lon
+    bad = db.execute(
+        select(func.count()).select_from(shadow).where(
+            lat.is_(None) | lon.is_(None)
+            | (lat < -90) | (lat > 90) | (lon < -180) | (lon > 180)
+        )
+    ).scalar()
+    if bad > loaded * settings.ATM_REFRESH_MAX_BAD_COORDS:
+        raise AtmRefreshError(f"{bad} of {loaded} ATMs have missing or out-of-range coordinates")
+
+    missing_ids = db.execute(
+        select(func.count()).select_from(shadow).where(shadow.c.suspected_atm_index.is_(None))
+    ).scalar()
+    if missing_ids:
+        raise AtmRefreshError(f"{missing_ids} ATMs have no atm_id")
+    return loaded, live
+
+
+def _swap(db: Session):
+    """Replace `atms` with the shadow table; runs in the caller's transaction."""
+    dialect = db.get_bind().dialect.name
+    specs = _index_specs()
+    if dialect == "postgresql":
+        # Fail fast rather than queue every ATM reader behind the DROP
+        db.execute(text(f"SET LOCAL lock_timeout = '{settings.ATM_REFRESH_LOCK_TIMEOUT_MS}ms'"))
+        db.execute(text(f"DROP TABLE {LIVE_TABLE}"))
+        db.execute(text(f"ALTER TABLE {SHADOW_TABLE} RENAME TO {LIVE_TABLE}"))
+        db.execute(text(f"ALTER INDEX {SHADOW_TABLE}_pkey RENAME TO {LIVE_TABLE}_pkey"))
+        for column, _ in specs:
+            db.execute(text(
+                f"ALTER INDEX {_index_name(SHADOW_TABLE, column)} RENAME TO {_index_name(LIVE_TABLE, column)}"
+            ))
+        # The SERIAL sequence followed the table; give it the canonical name
+        # so the next refresh can create atms_shadow_id_seq again
+        db.execute(text(f"ALTER SEQUENCE {SHADOW_TABLE}_id_seq RENAME TO {LIVE_TABLE}_id_seq"))
+    else:
+        # SQLite cannot rename indexes: recreate them under canonical names
+        db.execute(text(f"DROP TABLE {LIVE_TABLE}"))
+        db.execute(text(f"ALTER TABLE {SHADOW_TABLE} RENAME TO {LIVE_TABLE}"))
+        for column, unique in specs:
+            db.execute(text(f"DROP INDEX {_index_name(SHADOW_TABLE, column)}"))
+            db.execute(text(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX {_index_name(LIVE_TABLE, column)} "
+                f"ON {LIVE_TABLE} ({column})"
+            ))
+
+
+def refresh_atm_master(db: Session, path, chunk_size=None):
+    """
+    Load `path` (CSV or feature-store dataset) into `atms_shadow`, validate it, then swap it in for `atms`
+    and bump atm_master_version in one transaction.
+
+    Readers see the old table until the commit and the complete new one
+    after it. On any failure the shadow table is dropped and `atms` is left
+    as it was. Returns the new ATM master version.
+    """
+    chunk_size = chunk_size or settings.SEED_CHUNK_SIZE
+    shadow = _shadow_table()
+    bind = db.get_bind()
+    started = time.perf_counter()
+
+    shadow.drop(bind, checkfirst=True)  # leftover of an interrupted refresh
+    shadow.create(bind)
+    try:
+        loaded = 0
+        for chunk in feature_store.iter_chunks(path, chunk_size):
+            chunk.columns = [c.strip() for c in chunk.columns]
+            frame = map_atm_chunk(chunk)
+            write_chunk(db, shadow, frame)
+            loaded += len(frame)
+            print(f"[SEED] {SHADOW_TABLE}: {loaded:,} rows")
+        db.commit()
+
+        # Indexes are built after the load and before the swap, outside the
+        # window where `atms` is locked. A duplicate atm_id fails here.
+        for column, unique in _index_specs():
+            Index(_index_name(SHADOW_TABLE, column), shadow.c[column], unique=unique).create(bind)
+
+        loaded, live = _validate(db, shadow)
+        _swap(db)
+        version = bump_atm_master_version(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        shadow.drop(bind, checkfirst=True)
+        raise
+
+    print(f"[INFO] ATM master v{version}: {loaded:,} ATMs swapped in (was {live:,}) "
+          f"in {time.perf_counter() - started:.1f}s.")
+    return version
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        refresh_atm_master(db, sys.argv[1] if len(sys.argv) > 1 else "cipher_atm_master.csv")
+    except AtmRefreshError as e:
+        print(f"[ERROR] ATM refresh rejected: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
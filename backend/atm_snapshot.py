@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from .config import settings
+from .database import engine
+from .metrics import metrics
+from .models import ATMMasterVersion
+
+logger = logging.getLogger(__name__)
+
+
+class AtmSnapshot:
+    """
+    Immutable, typed copy of the `atms` table.
+
+    `arrays` holds one read-only NumPy array per column (the canonical
+    store, possibly memory-mapped); `frame` is a DataFrame over the same
+    data for pandas code, built on first use. Neither may be mutated by
+    callers - they are shared across requests.
+    """
+
+    def __init__(self, version, arrays):
+        self.version = version
+        self.arrays = arrays
+        self._frame = None
+        self.loaded_at = time.time()
+        # {bundle version: {feature: codes}} for ATM-side categoricals,
+        # filled lazily by predict.encode_atm_categoricals
+        self.encoded = {}
+        self._geo_index = None
+        self._coords = {}
+
+    def coords(self, dtype=np.float64):
+        """Precomputed distance terms for ATM lat/lon (see distance.CoordTerms)."""
+        key = np.dtype(dtype)
+        terms = self._coords.get(key)
+        if terms is None:
+            from distance import CoordTerms
+
+            terms = CoordTerms(self.arrays["atm_lat"], self.arrays["atm_lon"], dtype=key)
+            self._coords[key] = terms
+        return terms
+
+    @property
+    def geo_index(self):
+        """Spatial index over ATM lat/lon (built on first use)."""
+        if self._geo_index is None:
+            from .geo_index import AtmGeoIndex
+
+            self._geo_index = AtmGeoIndex(self.arrays["atm_lat"], self.arrays["atm_lon"])
+        return self._geo_index
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            self._frame = pd.DataFrame(self.arrays)
+        return self._frame
+
+    def __len__(self):
+        return len(self.arrays["atm_id"])
+
+
+def read_only(arr):
+    arr = np.ascontiguousarray(arr)
+    arr.setflags(write=False)
+    return arr
+
+
+def snapshot_arrays(raw: pd.DataFrame):
+    """Type-coerce a raw `atms` frame (DB column names) into snapshot columns."""
+    names = raw["suspected_atm_name"].to_numpy(dtype=object)
+    places = raw["suspected_atm_place"].to_numpy(dtype=object)
+
+    # Cast to correct types to avoid 'object' dtype (Decimal)
+    arrays = {
+        "atm_id": pd.to_numeric(raw["suspected_atm_index"], errors="coerce").fillna(0).astype(np.int64).to_numpy(),
+        "atm_lat": pd.to_numeric(raw["suspected_atm_lat"], errors="coerce").astype(np.float64).to_numpy(),
+        "atm_lon": pd.to_numeric(raw["suspected_atm_lon"], errors="coerce").astype(np.float64).to_numpy(),
+        "atm_name": names,
+        "atm_place": places,
+        "atm_total_complaints": pd.to_numeric(raw["atm_total_complaints"], errors="coerce").fillna(0).astype(np.int64).to_numpy(),
+        "atm_avg_loss": pd.to_numeric(raw["atm_avg_loss"], errors="coerce").astype(np.float64).to_numpy(),
+        # Nice display columns (kept separate from encoded cols)
+        "atm_name_display": names,
+        "atm_place_display": places,
+    }
+    return {k: read_only(v) for k, v in arrays.items()}
+
+
+def build_snapshot(version, raw: pd.DataFrame) -> AtmSnapshot:
+    """Type-coerce a raw `atms` frame (DB column names) into a snapshot."""
+    return AtmSnapshot(version, snapshot_arrays(raw))
+
+
+class AtmSnapshotService:
+    """
+    Serves the current AtmSnapshot, rebuilding it only when the version row
+    in `atm_master_version` changes. The version is polled at most every
+    `check_interval` seconds, so the common path is a pointer lookup.
+
+    With `shared_dir`, numeric columns are published there as .npy files
+    and memory-mapped, so several worker processes score against the same
+    physical pages: the first worker to see a new version builds and
+    publishes it, the others just map it. Only the raw columns are shared;
+    the geo index, coordinate terms and encoded categoricals are derived
+    per process.
+    """
+
+    def __init__(self, bind, check_interval=5.0, shared_dir=None):
+        self.bind = bind
+        self.check_interval = check_interval
+        self.shared_dir = shared_dir
+        self._snapshot = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        snapshot = self._snapshot
+        return snapshot.version if snapshot is not None else None
+
+    def get(self) -> AtmSnapshot:
+        now = time.monotonic()
+        if self._snapshot is None or now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self._refresh()
+        return self._snapshot
+
+    def invalidate(self):
+        """Force a rebuild on the next get() (e.g. right after a reseed in-process)."""
+        self._last_check = 0.0
+        with self._lock:
+            self._snapshot = None
+
+    def _read_version(self, conn):
+        return conn.execute(
+            text("SELECT version FROM atm_master_version WHERE id = 1")
+        ).scalar() or 0
+
+    def _load_shared(self, version):
+        if not self.shared_dir:
+            return None
+        from .shared_arrays import load_arrays
+
+        arrays = load_arrays(self.shared_dir, version)
+        if arrays is not None:
+            logger.info("ATM master snapshot v%s mapped from %s", version, self.shared_dir)
+        return arrays
+
+    def _refresh(self):
+        with self._lock:
+            with self.bind.connect() as conn:
+                version = self._read_version(conn)
+                if self._snapshot is not None and self._snapshot.version == version:
+                    return
+                arrays = self._load_shared(version)
+                if arrays is None:
+                    logger.info("Loading ATM master snapshot v%s from database ...", version)
+                    with metrics.stage("db_fetch"):
+                        raw = pd.read_sql(text("SELECT * FROM atms"), conn)
+                    arrays = snapshot_arrays(raw)
+                    if self.shared_dir:
+                        from .shared_arrays import export_arrays
+
+                        export_arrays(self.shared_dir, version, arrays)
+                        # Re-open as mmaps so this process shares pages too
+                        arrays = self._load_shared(version) or arrays
+
+            snapshot = AtmSnapshot(version, arrays)
+            # build derived structures before publishing, off the request path
+            snapshot.geo_index
+            snapshot.coords(settings.DISTANCE_DTYPE)
+            self._snapshot = snapshot
+            logger.info("ATM count: %d", len(snapshot))
+
+
+def bump_atm_master_version(db):
+    """Mark the `atms` table as changed. Call inside the reseed transaction."""
+    row = db.get(ATMMasterVersion, 1)
+    if row is None:
+        row = ATMMasterVersion(id=1, version=0)
+        db.add(row)
+    row.version = (row.version or 0) + 1
+    return row.version
+
+
+atm_snapshots = AtmSnapshotService(
+    engine,
+    check_interval=settings.ATM_SNAPSHOT_CHECK_SECONDS,
+    shared_dir=settings.SCORING_SHARED_DIR or None,
+)
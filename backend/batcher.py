@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+
+from .config import settings
+from .scoring_pool import scoring_pool, ScoringPoolBusy
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets (last one is open-ended)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class HotspotBatcher:
+    """
+    Coalesces concurrent single-complaint scoring requests.
+
+    Requests arriving within `window_ms` of the first queued one (or until
+    `max_batch` are queued) are scored together: one stacked
+    predict_atm_risk_batch call on the scoring pool, with each waiting
+    request receiving its own result frame. If the stacked call fails,
+    each request is rescored on its own, so one bad complaint only fails
+    its own request. Lives on the event loop; only the scoring itself
+    leaves it.
+    """
+
+    def __init__(self, pool, window_ms=5.0, max_batch=32):
+        self.pool = pool
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending = []      # (complaint dict, top_k, future, enqueued_at)
+        self._timer = None
+        # in-flight _run tasks; the loop only keeps weak references to them
+        self._tasks = set()
+        # metrics
+        self.batches = 0
+        self.requests = 0
+        self.fallbacks = 0
+        self.max_batch_seen = 0
+        self.batch_size_hist = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+
+    @property
+    def enabled(self):
+        return self.window > 0 and self.max_batch > 1
+
+    async def submit(self, complaint: dict, top_k):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((complaint, top_k, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        now = time.perf_counter()
+        self._record(batch, now)
+        # predict_atm_risk_batch takes one top_k per call
+        groups = defaultdict(list)
+        for item in batch:
+            groups[item[1]].append(item)
+        for top_k, items in groups.items():
+            task = asyncio.ensure_future(self._run(top_k, items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, top_k, items):
+        from predict import predict_atm_risk_batch
+
+        try:
+            frames = await self.pool.run(predict_atm_risk_batch, [i[0] for i in items], top_k=top_k)
+        except Exception as e:
+            if len(items) == 1 or isinstance(e, ScoringPoolBusy):
+                self._fail(items, e)
+                return
+            logger.warning("Batch of %d complaints failed, scoring them one by one: %s", len(items), e)
+            self.fallbacks += 1
+            await asyncio.gather(*(self._run(top_k, [item]) for item in items))
+            return
+        except BaseException as e:
+            self._fail(items, e)
+            raise
+        for (_, _, future, _), frame in zip(items, frames):
+            if not future.done():
+                future.set_result(frame)
+
+    @staticmethod
+    def _fail(items, exc):
+        for _, _, future, _ in items:
+            if not future.done():
+                future.set_exception(exc)
+
+    def _record(self, batch, flushed_at):
+        size = len(batch)
+        self.batches += 1
+        self.requests += size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        bucket = next((i for i, b in enumerate(BATCH_SIZE_BUCKETS) if size <= b), len(BATCH_SIZE_BUCKETS))
+        self.batch_size_hist[bucket] += 1
+        for _, _, _, enqueued_at in batch:
+            delay = flushed_at - enqueued_at
+            self.queue_delay_total += delay
+            self.queue_delay_max = max(self.queue_delay_max, delay)
+
+    def stats(self):
+        labels = [f"<={b}" for b in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "requests": self.requests,
+            "fallbacks": self.fallbacks,
+            "queued": len(self._pending),
+            "avg_batch_size": (self.requests / self.batches) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "batch_size_histogram": dict(zip(labels, self.batch_size_hist)),
+            "avg_queue_delay_ms": (self.queue_delay_total / self.requests * 1000.0) if self.requests else 0.0,
+            "max_queue_delay_ms": self.queue_delay_max * 1000.0,
+        }
+
+
+hotspot_batcher = HotspotBatcher(
+    scoring_pool,
+    window_ms=settings.BATCH_WINDOW_MS,
+    max_batch=settings.BATCH_MAX_SIZE,
+)
@@ -0,0 +1,129 @@
+import io
+import time
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import feature_store
+from .models import SeedCheckpoint
+
+
+def source_signature(path):
+    """Identifies one version of a CSV / store dataset; a changed source restarts its load."""
+    return feature_store.signature(path)
+
+
+def pick_column(df: pd.DataFrame, *names):
+    """First of `names` present in `df` (CSV exports disagree on naming)."""
+    for name in names:
+        if name in df.columns:
+            return df[name]
+    return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+
+def as_int(series: pd.Series):
+    """Nullable integers, so COPY gets "12" rather than "12.0" for NaN-bearing columns."""
+    return pd.to_numeric(series, errors="coerce").round().astype("Int64")
+
+
+def as_float(series: pd.Series):
+    return pd.to_numeric(series, errors="coerce")
+
+
+def write_chunk(db: Session, table, frame: pd.DataFrame):
+    """
+    Append `frame` (columns named after `table` columns) inside the
+    session's transaction: COPY FROM STDIN on PostgreSQL, one executemany
+    INSERT elsewhere.
+    """
+    if frame.empty:
+        return
+    conn = db.connection()
+    if conn.dialect.name == "postgresql":
+        buf = io.StringIO()
+        # Unquoted empty fields are NULL in COPY's CSV format
+        frame.to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        cols = ", ".join(frame.columns)
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {table.name} ({cols}) FROM STDIN WITH (FORMAT csv)", buf)
+        finally:
+            cursor.close()
+    else:
+        records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+        conn.execute(table.insert(), records)
+
+
+def _save_checkpoint(db: Session, name, source, rows_loaded, completed=False):
+    cp = db.get(SeedCheckpoint, name)
+    if cp is None:
+        cp = SeedCheckpoint(name=name)
+        db.add(cp)
+    cp.source = source
+    cp.rows_loaded = rows_loaded
+    cp.completed = completed
+    cp.updated_at = datetime.now()
+
+
+def load_csv(db: Session, path, model, mapper, chunk_size, replace=False, on_complete=None, columns=None):
+    """
+    Stream `path` (a CSV, or a feature_store.py dataset directory) into
+    `model`'s table in chunks of `chunk_size` rows, reading only `columns`.
+
+    `mapper(chunk)` turns a raw CSV chunk into a frame of table columns.
+    Each chunk and the row count in `seed_checkpoint` commit together, so
+    an interrupted load resumes after the last committed chunk of the same
+    file. A fresh load empties the table first; without `replace` a table
+    that was populated outside this loader is left alone.
+    `on_complete(db)` runs in the final transaction.
+    Returns the number of rows in the table from this file.
+    """
+    table = model.__table__
+    name = table.name
+    source = source_signature(path)
+
+    cp = db.get(SeedCheckpoint, name)
+    start = 0
+    if cp is not None and cp.source == source:
+        if cp.completed and not replace:
+            print(f"[SEED] {name}: already loaded from this file ({cp.rows_loaded:,} rows).")
+            return cp.rows_loaded
+        if not cp.completed:
+            start = cp.rows_loaded
+    elif cp is None and not replace and db.query(func.count()).select_from(table).scalar():
+        print(f"[SEED] {name}: already seeded.")
+        return None
+
+    if start:
+        print(f"[SEED] {name}: resuming after row {start:,}.")
+    else:
+        db.execute(table.delete())
+        _save_checkpoint(db, name, source, 0)
+        db.commit()
+
+    if columns is not None:
+        available = set(feature_store.columns_of(path))
+        columns = [c for c in columns if c in available]
+
+    loaded = start
+    started = time.perf_counter()
+    reader = feature_store.iter_chunks(path, chunk_size, columns=columns, skip_rows=start)
+    for chunk in reader:
+        chunk.columns = [c.strip() for c in chunk.columns]
+        frame = mapper(chunk)
+        write_chunk(db, table, frame)
+        loaded += len(frame)
+        _save_checkpoint(db, name, source, loaded)
+        db.commit()
+        rate = (loaded - start) / max(time.perf_counter() - started, 1e-9)
+        print(f"[SEED] {name}: {loaded:,} rows ({rate:,.0f} rows/s)")
+
+    _save_checkpoint(db, name, source, loaded, completed=True)
+    if on_complete is not None:
+        on_complete(db)
+    db.commit()
+    print(f"[SEED] {name}: done, {loaded:,} rows in {time.perf_counter() - started:.1f}s.")
+    return loaded
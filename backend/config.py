@@ -10,6 +10,97 @@ class Settings:
     POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
     POSTGRES_PORT = os.getenv("POSTGRES_PORT", "5432")
     POSTGRES_DB = os.getenv("POSTGRES_DB", "cipher_db")
+
+    # Postgres connection pool. Pre-ping drops connections the server or a
+    # proxy closed; recycle retires them before idle timeouts do. Statement
+    # timeout (0 = none) bounds runaway queries holding a pooled connection.
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+    # History SQLite database and its pragmas (applied on every connection).
+    # HISTORY_SQLITE_CACHE_SIZE < 0 is in KiB, as in SQLite itself.
+    HISTORY_DATABASE_URL = os.getenv("HISTORY_DATABASE_URL", "sqlite:///./history.db")
+    HISTORY_POOL_SIZE = int(os.getenv("HISTORY_POOL_SIZE", "5"))
+    HISTORY_MAX_OVERFLOW = int(os.getenv("HISTORY_MAX_OVERFLOW", "10"))
+    HISTORY_SQLITE_JOURNAL_MODE = os.getenv("HISTORY_SQLITE_JOURNAL_MODE", "WAL")
+    HISTORY_SQLITE_SYNCHRONOUS = os.getenv("HISTORY_SQLITE_SYNCHRONOUS", "NORMAL")
+    HISTORY_SQLITE_MMAP_SIZE = int(os.getenv("HISTORY_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    HISTORY_SQLITE_CACHE_SIZE = int(os.getenv("HISTORY_SQLITE_CACHE_SIZE", "-65536"))
+    HISTORY_SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("HISTORY_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+    # Ranker bundle: loaded once per process, re-checked on disk at most
+    # every MODEL_RELOAD_CHECK_SECONDS
+    MODEL_BUNDLE_PATH = os.getenv("MODEL_BUNDLE_PATH", "cipher_ranker_bundle.pkl")
+    MODEL_RELOAD_CHECK_SECONDS = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "2"))
+
+    # ATM master snapshot: atm_master_version is polled at most this often
+    ATM_SNAPSHOT_CHECK_SECONDS = float(os.getenv("ATM_SNAPSHOT_CHECK_SECONDS", "5"))
+
+    # Spatial candidate pruning for top-K predictions: only ATMs within
+    # CANDIDATE_RADIUS_KM of the victim are scored. The radius doubles up to
+    # CANDIDATE_MAX_RADIUS_KM until CANDIDATE_MIN_COUNT ATMs are found;
+    # CANDIDATE_MAX_COUNT > 0 caps scoring to the nearest N. Radius 0 disables.
+    CANDIDATE_RADIUS_KM = float(os.getenv("CANDIDATE_RADIUS_KM", "50"))
+    CANDIDATE_MAX_RADIUS_KM = float(os.getenv("CANDIDATE_MAX_RADIUS_KM", "400"))
+    CANDIDATE_MIN_COUNT = int(os.getenv("CANDIDATE_MIN_COUNT", "500"))
+    CANDIDATE_MAX_COUNT = int(os.getenv("CANDIDATE_MAX_COUNT", "0"))
+
+    # Precision of the victim -> ATM distance feature at serving time
+    # ("float64" or "float32"); the formula itself comes from the bundle
+    DISTANCE_DTYPE = os.getenv("DISTANCE_DTYPE", "float64")
+
+    # Scored-ranking cache in front of predict_atm_risk (size 0 disables)
+    PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "256"))
+    PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "300"))
+
+    # Dedicated scoring pool: worker threads (0 = min(4, cpu count)) and how
+    # many more scoring requests may queue before the API answers 503
+    SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "0"))
+    SCORING_MAX_QUEUE = int(os.getenv("SCORING_MAX_QUEUE", "32"))
+
+    # Hotspot batch limits: complaints accepted per :batch request (413
+    # beyond), and complaints stacked into one feature matrix / model call
+    # (a full ranking is n_atm rows per complaint)
+    HOTSPOT_BATCH_MAX_COMPLAINTS = int(os.getenv("HOTSPOT_BATCH_MAX_COMPLAINTS", "256"))
+    SCORING_CHUNK_COMPLAINTS = int(os.getenv("SCORING_CHUNK_COMPLAINTS", "16"))
+
+    # Micro-batching: concurrent single-complaint hotspot requests arriving
+    # within BATCH_WINDOW_MS are scored in one model call (0 disables)
+    BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "5"))
+    BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+
+    # Multi-process scoring: directory where the ATM snapshot is published
+    # as memory-mapped .npy files shared by all workers (empty = per-process)
+    SCORING_SHARED_DIR = os.getenv("SCORING_SHARED_DIR", "")
+
+    # Complaints moved per set-based statement by the archive pipeline
+    ARCHIVE_CHUNK_SIZE = int(os.getenv("ARCHIVE_CHUNK_SIZE", "500"))
+
+    # Rows per COPY / executemany chunk when backend/seed.py loads CSVs
+    SEED_CHUNK_SIZE = int(os.getenv("SEED_CHUNK_SIZE", "50000"))
+
+    # ATM master refresh (backend/atm_refresh.py): the shadow table is
+    # rejected if it has fewer than ATM_REFRESH_MIN_ROWS rows, shrinks the
+    # master by more than ATM_REFRESH_MAX_SHRINK, or has more than that
+    # fraction of rows with bad coordinates
+    ATM_REFRESH_MIN_ROWS = int(os.getenv("ATM_REFRESH_MIN_ROWS", "1"))
+    ATM_REFRESH_MAX_SHRINK = float(os.getenv("ATM_REFRESH_MAX_SHRINK", "0.5"))
+    ATM_REFRESH_MAX_BAD_COORDS = float(os.getenv("ATM_REFRESH_MAX_BAD_COORDS", "0.0"))
+    ATM_REFRESH_LOCK_TIMEOUT_MS = int(os.getenv("ATM_REFRESH_LOCK_TIMEOUT_MS", "5000"))
+
+    # Optional JSON file overriding predict.RISK_BANDS (see predict.load_risk_bands)
+    RISK_BANDS_PATH = os.getenv("RISK_BANDS_PATH", "")
+
+    # Observability: per-stage timers and request counters behind /metrics
+    # (backend/metrics.py), OpenTelemetry spans around the same stages when
+    # the opentelemetry package is installed, and the root log level
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    OTEL_TRACING = os.getenv("OTEL_TRACING", "false").lower() in ("1", "true", "yes")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
     
     @property
     def DATABASE_URL(self):
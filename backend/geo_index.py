@@ -0,0 +1,63 @@
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from distance import EARTH_RADIUS_KM
+
+
+class AtmGeoIndex:
+    """
+    Haversine ball tree over ATM coordinates, used to prune the candidate
+    set before model scoring. Query results are row indices into the
+    snapshot arrays the index was built from (ATMs with missing
+    coordinates are never returned).
+    """
+
+    def __init__(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        self._rows = np.flatnonzero(valid)
+        self._tree = None
+        if len(self._rows):
+            points = np.radians(np.column_stack([lat[valid], lon[valid]]))
+            self._tree = BallTree(points, metric="haversine")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _point(self, lat, lon):
+        return np.radians([[lat, lon]])
+
+    def within(self, lat, lon, radius_km):
+        """Rows of ATMs within radius_km of (lat, lon), in ascending row order."""
+        if self._tree is None:
+            return self._rows
+        hits = self._tree.query_radius(self._point(lat, lon), r=radius_km / EARTH_RADIUS_KM)[0]
+        return np.sort(self._rows[hits])
+
+    def nearest(self, lat, lon, n):
+        """Rows of the n ATMs closest to (lat, lon), in ascending row order."""
+        if self._tree is None or n >= len(self._rows):
+            return self._rows
+        _, hits = self._tree.query(self._point(lat, lon), k=n)
+        return np.sort(self._rows[hits[0]])
+
+    def candidates(self, lat, lon, radius_km, min_candidates, max_radius_km, max_candidates=0):
+        """
+        Radius search that doubles the radius (up to max_radius_km) until at
+        least min_candidates ATMs are found, falling back to the nearest
+        min_candidates. max_candidates > 0 caps the result to the nearest N.
+        """
+        radius = radius_km
+        while True:
+            rows = self.within(lat, lon, radius)
+            if len(rows) >= min_candidates:
+                break
+            if radius >= max_radius_km:
+                rows = self.nearest(lat, lon, min_candidates)
+                break
+            radius = min(radius * 2.0, max_radius_km)
+
+        if max_candidates and len(rows) > max_candidates:
+            rows = self.nearest(lat, lon, max_candidates)
+        return rows
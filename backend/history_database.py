@@ -1,14 +1,43 @@
-
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from .config import settings
+from .pool_metrics import TimedQueuePool
 
 # Separate SQLite DB for History
-HISTORY_DATABASE_URL = "sqlite:///./history.db"
+HISTORY_DATABASE_URL = settings.HISTORY_DATABASE_URL
 
 engine_history = create_engine(
-    HISTORY_DATABASE_URL, connect_args={"check_same_thread": False}
+    HISTORY_DATABASE_URL,
+    poolclass=TimedQueuePool,
+    pool_size=settings.HISTORY_POOL_SIZE,
+    max_overflow=settings.HISTORY_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    connect_args={
+        "check_same_thread": False,
+        # seconds to wait on a locked database before "database is locked"
+        "timeout": settings.HISTORY_SQLITE_BUSY_TIMEOUT_MS / 1000.0,
+    },
 )
+
+
+@event.listens_for(engine_history, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    WAL lets readers run alongside the single writer instead of queueing
+    behind it; synchronous=NORMAL is durable across app crashes in WAL
+    mode. mmap/cache sizes keep hot history pages out of read() calls.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.HISTORY_SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.HISTORY_SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={settings.HISTORY_SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={settings.HISTORY_SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.HISTORY_SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
 SessionHistory = sessionmaker(autocommit=False, autoflush=False, bind=engine_history)
 
 BaseHistory = declarative_base()
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, text
 from backend.history_database import BaseHistory
 
 class HistoryComplaint(BaseHistory):
@@ -11,7 +11,7 @@ class HistoryComplaint(BaseHistory):
     
     # Location
     victim_state = Column(String)
-    victim_district = Column(String)
+    victim_district = Column(String, index=True)
     victim_taluka = Column(String)
     victim_village = Column(String)
     victim_pincode = Column(Integer)
@@ -21,8 +21,8 @@ class HistoryComplaint(BaseHistory):
 
     # Fraud details
     channel = Column(String)
-    fraud_type = Column(String)
-    bank_name = Column(String)
+    fraud_type = Column(String, index=True)
+    bank_name = Column(String, index=True)
     reported_loss_amount = Column(Float)
     num_transactions = Column(Integer)
     device_type = Column(String)
@@ -37,3 +37,49 @@ class HistoryComplaint(BaseHistory):
     status = Column(String, default="Resolved")
     resolution_date = Column(DateTime)
     resolution_notes = Column(String)
+
+    # Keyset pages of /api/history: one (sort column, complaint_id) index
+    # per sortable column, so ORDER BY and the cursor comparison are a seek.
+    # They also serve the timestamp and status filters, which is why those
+    # two columns carry no single-column index.
+    __table_args__ = (
+        Index("ix_history_complaint_timestamp_complaint_id", complaint_timestamp, complaint_id),
+        Index("ix_history_resolution_date_complaint_id", resolution_date, complaint_id),
+        Index("ix_history_reported_loss_amount_complaint_id", reported_loss_amount, complaint_id),
+        Index("ix_history_urgency_score_complaint_id", urgency_score, complaint_id),
+        Index("ix_history_status_complaint_id", status, complaint_id),
+    )
+
+
+class ArchiveOutbox(BaseHistory):
+    __tablename__ = "archive_outbox"
+
+    # One row per complaint copied into history whose delete from the live
+    # DB is not yet confirmed. Written in the same SQLite transaction as the
+    # history rows and removed once the live delete commits, so anything
+    # left here after a crash is replayed by recover_pending_archives().
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(String, index=True, nullable=False)
+    complaint_id = Column(String, index=True, nullable=False)
+    created_at = Column(DateTime)
+
+
+# Single-column indexes made redundant by the composites above; dropped
+# from history.db files created before them
+SUPERSEDED_INDEXES = (
+    "ix_history_complaints_complaint_timestamp",
+    "ix_history_complaints_status",
+)
+
+
+def ensure_history_indexes(engine):
+    """
+    create_all() only indexes new tables; add indexes declared since an
+    existing history.db was created and drop the ones they superseded.
+    """
+    for table in BaseHistory.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        for name in SUPERSEDED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
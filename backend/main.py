@@ -1,28 +1,85 @@
 
 # backend/main.py
+import base64
+import json
+import logging
+import time
 from pydantic import BaseModel, field_validator
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import DateTime, and_, func, or_, tuple_
 from sqlalchemy.orm import Session
 
-import pandas as pd
-import numpy as np
-from predict import predict_atm_risk  # your function from predict.py
-from backend.database import get_db, engine, Base
-from backend.models import Complaint as DBComplaint, ATM
+from predict import predict_atm_risk_batch  # your function from predict.py
+from backend.config import settings
+from backend.metrics import metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_REQUESTS, HTTP_REQUEST_SECONDS
+from backend.model_registry import model_registry
+from backend.atm_snapshot import atm_snapshots
+from backend.database import get_db, engine, Base, SessionLocal
+from backend.scoring_pool import scoring_pool, ScoringPoolBusy
+from backend.batcher import hotspot_batcher
+from backend.prediction_cache import prediction_cache
+from backend.pool_metrics import pool_stats
+from backend.serialization import dump_hotspots, iter_json_array, iter_ndjson
+from backend.models import Complaint as DBComplaint, ATM, ensure_indexes
 
 # History API
-from backend.history_database import SessionHistory
-from backend.history_models import HistoryComplaint
+from backend.history_database import SessionHistory, engine_history, BaseHistory
+from backend.history_models import HistoryComplaint, ensure_history_indexes
+from backend.archive import archive_complaints, recover_pending_archives, ARCHIVED_STATUS
+
+logging.basicConfig(
+    level=settings.LOG_LEVEL,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
 
 # Create tables on startup (if not already)
 Base.metadata.create_all(bind=engine)
+ensure_indexes(engine)
+BaseHistory.metadata.create_all(bind=engine_history)
+ensure_history_indexes(engine_history)
 
 app = FastAPI(title="CIPHER ATM Risk API")
 
+
+@app.on_event("startup")
+def load_model_bundle():
+    # Deserialize the ranker once per process instead of once per request.
+    # get() (not load()) so a bundle already loaded in post_fork (see
+    # gunicorn.conf.py) is not read again.
+    model_registry.get()
+    try:
+        atm_snapshots.get()
+    except Exception as e:
+        # Not fatal: the snapshot is built lazily on the first prediction
+        logger.warning("Could not warm ATM snapshot: %s", e)
+
+
+@app.on_event("startup")
+def recover_archive_outbox():
+    # Finish archives interrupted between the history and live commits
+    db, history_db = SessionLocal(), SessionHistory()
+    try:
+        recovered = recover_pending_archives(db, history_db)
+        if recovered:
+            logger.info("Recovered %d interrupted archive(s)", recovered)
+    except Exception as e:
+        logger.warning("Archive outbox recovery failed: %s", e)
+    finally:
+        db.close()
+        history_db.close()
+
+
+@app.on_event("shutdown")
+def stop_scoring_pool():
+    scoring_pool.shutdown()
+
+
 # --- CORS so React (http://localhost:5173) can talk to FastAPI ---
 app.add_middleware(
     CORSMiddleware,
@@ -30,14 +87,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # keyset cursors of /api/complaints and /api/history pages
+    expose_headers=["X-Next-Cursor"],
 )
 
+if metrics.enabled:
+    @app.middleware("http")
+    async def count_requests(request: Request, call_next):
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Route template, not the raw path, keeps label cardinality bounded
+            route = request.scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            HTTP_REQUESTS.inc(request.method, path, str(status))
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, path)
+
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
-    print(f"VALIDATION ERROR: {exc}")
+    logger.warning("Validation error: %s", exc)
     with open("C:/Users/SRIVANDHI/CIPHER/CIPHER-25257/debug_val_error.log", "a") as f:
         f.write(f"Validation Error: {exc}\nBody: {exc.body}\n")
     return JSONResponse(
@@ -106,47 +181,138 @@ class ATMRisk(BaseModel):
 
 # ---------- ENDPOINTS --------------
 
+# API field -> live DB column (everything else has the same name)
+COMPLAINT_COLUMN_FOR_FIELD = {"time_of_complaint": "complaint_timestamp"}
+COMPLAINT_PAGE_MAX = 1000
+# Fields the Complaint validators turn from None into 0 / 0.0
+COMPLAINT_NUMERIC_FIELDS = {
+    "victim_pincode": 0, "num_transactions": 0, "account_age_months": 0,
+    "prior_complaints_same_upi": 0, "is_otp_shared": 0, "clicked_malicious_link": 0,
+    "victim_lat": 0.0, "victim_lon": 0.0, "reported_loss_amount": 0.0, "urgency_score": 0.0,
+}
+
+
+def _encode_cursor(ts: Optional[datetime], complaint_id: str) -> str:
+    raw = json.dumps({"ts": ts.isoformat() if ts is not None else None, "id": complaint_id}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        ts = datetime.fromisoformat(data["ts"]) if data["ts"] is not None else None
+        return ts, str(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after_complaint(ts: Optional[datetime], complaint_id: str):
+    """
+    Keyset condition for rows after (ts, complaint_id) in
+    (complaint_timestamp NULLS FIRST, complaint_id) order, on the raw
+    columns so ix_complaints_timestamp_id serves both filter and sort.
+    """
+    if ts is None:
+        # still inside the NULL-timestamp block, or past it
+        return or_(
+            and_(DBComplaint.complaint_timestamp.is_(None), DBComplaint.complaint_id > complaint_id),
+            DBComplaint.complaint_timestamp.isnot(None),
+        )
+    return tuple_(DBComplaint.complaint_timestamp, DBComplaint.complaint_id) > (ts, complaint_id)
+
+
+def _complaint_fields(fields: Optional[str]) -> List[str]:
+    """Requested projection (complaint_id always included), validated against the schema."""
+    all_fields = list(Complaint.model_fields)
+    if not fields:
+        return all_fields
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in Complaint.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}")
+    return ["complaint_id"] + [f for f in requested if f != "complaint_id"]
+
+
 @app.get("/api/complaints", response_model=List[Complaint])
-def read_complaints(db: Session = Depends(get_db)):
-    """Fetch all complaints from PostgreSQL"""
-    print("[DEBUG] Fetching complaints from DB...")
-    complaints = db.query(DBComplaint).all()
-    print(f"[DEBUG] Found {len(complaints)} complaints")
-    
-    result = []
-    for c in complaints:
-        # Create a safe copy of data mapped to Pydantic schema
-        c_dict = {
-            "complaint_id": c.complaint_id,
-            "victim_state": c.victim_state,
-            "victim_district": c.victim_district,
-            "victim_taluka": c.victim_taluka,
-            "victim_village": c.victim_village,
-            "victim_pincode": c.victim_pincode,
-            "victim_rural_urban": c.victim_rural_urban,
-            "victim_lat": c.victim_lat,
-            "victim_lon": c.victim_lon,
-            "channel": c.channel,
-            "fraud_type": c.fraud_type,
-            "bank_name": c.bank_name,
-            "reported_loss_amount": c.reported_loss_amount,
-            "num_transactions": c.num_transactions,
-            "device_type": c.device_type,
-            "is_otp_shared": c.is_otp_shared,
-            "clicked_malicious_link": c.clicked_malicious_link,
-            "urgency_score": c.urgency_score,
-            "account_age_months": c.account_age_months,
-            "prior_complaints_same_upi": c.prior_complaints_same_upi,
-            "linked_fraud_ring": c.linked_fraud_ring,
-            "time_of_complaint": c.complaint_timestamp
-        }
-        result.append(c_dict)
-    
-    return result
+async def read_complaints(
+    limit: Optional[int] = Query(None, ge=1, le=COMPLAINT_PAGE_MAX, description="Page size; omit to stream every complaint"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    district: Optional[str] = None,
+    fraud_type: Optional[str] = None,
+    bank: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of Complaint fields"),
+    response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db),
+):
+    """
+    Fetch complaints from PostgreSQL, oldest first by
+    (complaint_timestamp, complaint_id), complaints without a timestamp first.
 
-@app.post("/api/complaints", response_model=Complaint)
-def create_complaint(complaint: Complaint, db: Session = Depends(get_db)):
-    """Create a new complaint"""
+    Filters and the keyset cursor run in SQL and only the projected columns
+    are selected. With `limit`, one page is returned and the cursor for the
+    next page is sent in the X-Next-Cursor header (absent on the last
+    page). Without it, every matching row is streamed, as a JSON array or
+    as NDJSON (format=ndjson) so the sidebar can render progressively.
+    """
+    names = _complaint_fields(fields)
+    after = _decode_cursor(cursor) if cursor else None
+    columns = [
+        getattr(DBComplaint, COMPLAINT_COLUMN_FOR_FIELD.get(name, name)).label(name)
+        for name in names
+    ]
+
+    def build_query(session: Session):
+        q = session.query(*columns, DBComplaint.complaint_timestamp.label("_sort_ts"))
+        if district:
+            q = q.filter(DBComplaint.victim_district == district)
+        if fraud_type:
+            q = q.filter(DBComplaint.fraud_type == fraud_type)
+        if bank:
+            q = q.filter(DBComplaint.bank_name == bank)
+        if date_from:
+            q = q.filter(DBComplaint.complaint_timestamp >= date_from)
+        if date_to:
+            q = q.filter(DBComplaint.complaint_timestamp <= date_to)
+        if after:
+            q = q.filter(_after_complaint(*after))
+        return q.order_by(DBComplaint.complaint_timestamp.asc().nulls_first(), DBComplaint.complaint_id)
+
+    # Same None -> 0 coercion the Complaint validators apply
+    numeric_names = [n for n in names if n in COMPLAINT_NUMERIC_FIELDS]
+
+    def as_dict(row):
+        d = {name: row[i] for i, name in enumerate(names)}
+        for name in numeric_names:
+            if d[name] is None:
+                d[name] = COMPLAINT_NUMERIC_FIELDS[name]
+        return d
+
+    media_type = "application/x-ndjson" if response_format == "ndjson" else "application/json"
+    encode = iter_ndjson if response_format == "ndjson" else iter_json_array
+
+    if limit is not None:
+        # One page: fetch one extra row to know whether another page exists
+        rows = await run_in_threadpool(lambda: build_query(db).limit(limit + 1).all())
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = _encode_cursor(rows[-1]._sort_ts, rows[-1].complaint_id)
+        body = b"".join(encode(as_dict(r) for r in rows))
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    def stream():
+        # Own session: the request-scoped one may be closed before streaming ends
+        session = SessionLocal()
+        try:
+            yield from encode(as_dict(r) for r in build_query(session).yield_per(500))
+        finally:
+            session.close()
+
+    return StreamingResponse(stream(), media_type=media_type)
+
+def _create_complaint(db: Session, complaint: Complaint):
     db_complaint = db.query(DBComplaint).filter(DBComplaint.complaint_id == complaint.complaint_id).first()
     if db_complaint:
         # update or return existing
@@ -167,106 +333,177 @@ def create_complaint(complaint: Complaint, db: Session = Depends(get_db)):
     return new_complaint
 
 
-@app.post("/api/complaints/atm-hotspots", response_model=Dict[str, List[ATMRisk]])
-def get_atm_hotspots(complaint: Complaint, db: Session = Depends(get_db)):
-    """
-    Given a complaint:
-    1. Upsert complaint in DB
-    2. Run prediction (reads ATM data from DB)
-    3. Return TOP 25 ranked ATM hotspots
-    """
-    
-    # 1. Upsert Complaint
-    try:
-        existing = db.query(DBComplaint).filter(DBComplaint.complaint_id == complaint.complaint_id).first()
-        if existing:
-            pass # Already exists
-        else:
+@app.post("/api/complaints", response_model=Complaint)
+async def create_complaint(complaint: Complaint, db: Session = Depends(get_db)):
+    """Create a new complaint"""
+    return await run_in_threadpool(_create_complaint, db, complaint)
+
+
+def _upsert_complaints(db: Session, complaints: List[Complaint]):
+    """Insert the complaints not yet in the live DB (one lookup, one commit)."""
+    with metrics.stage("db_upsert"):
+        ids = [c.complaint_id for c in complaints]
+        existing = {
+            cid for (cid,) in db.query(DBComplaint.complaint_id).filter(DBComplaint.complaint_id.in_(ids))
+        }
+        for complaint in complaints:
+            if complaint.complaint_id in existing:
+                continue  # Already exists
             comp_data = complaint.dict()
             comp_data['complaint_timestamp'] = comp_data.pop('time_of_complaint', None)
             if not comp_data['complaint_timestamp']:
                 comp_data['complaint_timestamp'] = datetime.now()
-            new_comp = DBComplaint(**comp_data)
-            db.add(new_comp)
-            db.commit()
+            db.add(DBComplaint(**comp_data))
+            existing.add(complaint.complaint_id)
+        db.commit()
+
+
+def _model_input(complaint: Complaint) -> Dict[str, Any]:
+    c_dict = complaint.dict()
+    # Robustly handle timestamp
+    ts = c_dict.get('time_of_complaint')
+    if not ts:
+        ts = datetime.now()
+    c_dict['complaint_timestamp'] = ts
+    return c_dict
+
+
+def _log_error(stage: str, e: Exception):
+    import traceback
+    with open("C:/Users/SRIVANDHI/CIPHER/CIPHER-25257/debug_err.log", "a") as f:
+        f.write(f"{stage} Error: {e}\n{traceback.format_exc()}\n")
+    logger.error("%s Error: %s", stage, e)
+
+
+def _score_and_encode(c_dicts, top_k) -> bytes:
+    """Scoring-pool job: rank ATMs and encode the response body off the event loop."""
+    frames = predict_atm_risk_batch(c_dicts, top_k=top_k)
+    # { complaint_id: [ {...}, {...} ] }
+    return dump_hotspots(c_dicts, frames)
+
+
+async def _run_scoring(complaints: List[Complaint], db: Session, top_k) -> Response:
+    # 1. Upsert complaints (threadpool: blocking DB I/O)
+    try:
+        await run_in_threadpool(_upsert_complaints, db, complaints)
     except Exception as e:
-        import traceback
-        with open("C:/Users/SRIVANDHI/CIPHER/CIPHER-25257/debug_err.log", "a") as f:
-            f.write(f"Upsert Error: {e}\n{traceback.format_exc()}\n")
-        print(f"Upsert Error: {e}")
+        _log_error("Upsert", e)
         raise e
 
+    # 2. Run model on the dedicated, bounded scoring pool; single top-K
+    #    requests go through the micro-batcher to share a model call
     try:
-        # 2. Run model
-        c_dict = complaint.dict()
-        # Robustly handle timestamp
-        ts = c_dict.get('time_of_complaint')
-        if not ts:
-            ts = datetime.now()
-        c_dict['complaint_timestamp'] = ts
-        
-        df: pd.DataFrame = predict_atm_risk(c_dict)
-
-        # keep TOP 50
-        TOP_K = 50
-        df = (
-            df.sort_values("risk_score_raw", ascending=False)
-            .head(TOP_K)
-            .reset_index(drop=True)
+        c_dicts = [_model_input(c) for c in complaints]
+        if len(complaints) == 1 and top_k is not None and hotspot_batcher.enabled:
+            df = await hotspot_batcher.submit(c_dicts[0], top_k)
+            # orjson encoding is CPU work too: keep it off the event loop
+            body = await run_in_threadpool(dump_hotspots, c_dicts, [df])
+        else:
+            body = await scoring_pool.run(_score_and_encode, c_dicts, top_k)
+    except ScoringPoolBusy as e:
+        logger.warning("Scoring pool saturated, rejecting request: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail="Scoring capacity exhausted, retry shortly",
+            headers={"Retry-After": "1"},
         )
-
-        # DEBUG: confirm how many rows we are actually returning
-        print(f"[DEBUG] Returning {len(df)} ATM hotspots for complaint {complaint.complaint_id}")
-
-        # build list of ATMRisk dicts
-        hotspots: List[Dict[str, Any]] = []
-        for _, row in df.iterrows():
-            # Helper to sanitize float
-            def sanitize(val):
-                if pd.isna(val) or val is None:
-                    return 0.0
-                try:
-                    f = float(val)
-                    if not np.isfinite(f):
-                        return 0.0
-                    return f
-                except:
-                    return 0.0
-
-            hotspots.append(
-                {
-                    "atm_id": int(row["atm_id"]),
-                    "atm_name": row["atm_name_display"],
-                    "lat": sanitize(row["atm_lat"]),
-                    "lon": sanitize(row["atm_lon"]),
-                    "risk_score": sanitize(row["risk_score_raw"]),
-                    "risk_score_norm": sanitize(row["risk_score_norm"]),
-                    "risk_class": row["risk_class"],
-                    "rank": int(row["rank_order"]),
-
-                    # from complaint / ATM master
-                    "fraud_type": complaint.fraud_type,
-                    "suspected_atm_place": row["atm_place_display"],
-                    "total_complaints": int(row["atm_total_complaints"]),
-                    "bank_name": complaint.bank_name,
-                    "estimated_loss": sanitize(row["atm_avg_loss"]),
-
-                    # meta
-                    "complaint_id": complaint.complaint_id,
-                    "time_of_complaint": c_dict['complaint_timestamp'],
-                }
-            )
-
-        # { complaint_id: [ {...}, {...} ] }
-        return {complaint.complaint_id: hotspots}
-        
     except Exception as e:
-        import traceback
-        with open("C:/Users/SRIVANDHI/CIPHER/CIPHER-25257/debug_err.log", "a") as f:
-            f.write(f"Prediction Error: {e}\n{traceback.format_exc()}\n")
-        print(f"Prediction Error: {e}")
+        _log_error("Prediction", e)
         raise e
 
+    # Trusted internal output: the route's response_model documents the
+    # schema in OpenAPI, but returning a Response skips re-validating it.
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/api/complaints/atm-hotspots", response_model=Dict[str, List[ATMRisk]])
+async def get_atm_hotspots(
+    complaint: Complaint,
+    top_k: int = Query(50, ge=1, description="Number of top-ranked ATMs to return"),
+    full_ranking: bool = Query(False, description="Return every ATM ranked (analyst mode); ignores top_k"),
+    db: Session = Depends(get_db),
+):
+    """
+    Given a complaint:
+    1. Upsert complaint in DB
+    2. Run prediction (reads ATM data from DB)
+    3. Return the top_k ranked ATM hotspots (or all of them with full_ranking)
+
+    Answers 503 (Retry-After) when the scoring pool is saturated.
+    """
+    return await _run_scoring([complaint], db, None if full_ranking else top_k)
+
+
+@app.post("/api/complaints/atm-hotspots:batch", response_model=Dict[str, List[ATMRisk]])
+async def get_atm_hotspots_batch(
+    complaints: List[Complaint],
+    top_k: int = Query(50, ge=1, description="Number of top-ranked ATMs to return per complaint"),
+    full_ranking: bool = Query(False, description="Return every ATM ranked (analyst mode); ignores top_k"),
+    db: Session = Depends(get_db),
+):
+    """
+    Batch version of /api/complaints/atm-hotspots for triage runs: upserts
+    all complaints, scores them in stacked model calls of
+    SCORING_CHUNK_COMPLAINTS and returns
+    { complaint_id: [ATMRisk, ...] } with per-complaint top_k.
+
+    Answers 413 beyond HOTSPOT_BATCH_MAX_COMPLAINTS complaints.
+    """
+    if not complaints:
+        return Response(content=b"{}", media_type="application/json")
+    if len(complaints) > settings.HOTSPOT_BATCH_MAX_COMPLAINTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.HOTSPOT_BATCH_MAX_COMPLAINTS} complaints per batch",
+        )
+    return await _run_scoring(complaints, db, None if full_ranking else top_k)
+
+
+@app.get("/api/scoring/stats")
+async def get_scoring_stats():
+    """Scoring pool, micro-batcher and prediction cache counters."""
+    return {
+        "pool": scoring_pool.stats(),
+        "batcher": hotspot_batcher.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "model_version": model_registry.version,
+        "atm_snapshot_version": atm_snapshots.version,
+        "stages": metrics.stage_summary(),
+    }
+
+
+@app.get("/api/db/stats")
+async def get_db_stats():
+    """Connection pool checkout wait and saturation for both databases."""
+    return {
+        "live": pool_stats(engine),
+        "history": pool_stats(engine_history),
+    }
+
+
+# Existing stats dicts, exported as gauges on every /metrics scrape
+metrics.register_collector("cipher_prediction_cache", prediction_cache.stats)
+metrics.register_collector("cipher_scoring_pool", scoring_pool.stats)
+metrics.register_collector("cipher_batcher", hotspot_batcher.stats)
+metrics.register_collector("cipher_db_pool_live", lambda: pool_stats(engine))
+metrics.register_collector("cipher_db_pool_history", lambda: pool_stats(engine_history))
+metrics.register_collector("cipher", lambda: {
+    "model_version": model_registry.version,
+    "atm_snapshot_version": atm_snapshots.version,
+})
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus text format: per-stage latency histograms, request counters
+    and the cache / scoring pool / batcher / DB pool gauges of this process.
+    """
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED)")
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 def get_history_db():
     db = SessionHistory()
     try:
@@ -275,7 +512,7 @@ def get_history_db():
         db.close()
 
 @app.post("/api/complaints/{complaint_id}/archive")
-def archive_complaint_to_history(
+async def archive_complaint_to_history(
     complaint_id: str,
     db: Session = Depends(get_db),
     history_db: Session = Depends(get_history_db)
@@ -284,82 +521,215 @@ def archive_complaint_to_history(
     Archive a complaint from active complaints to history.
     Used when forwarding to bank.
     """
+    return await run_in_threadpool(_archive_complaint, complaint_id, db, history_db)
+
+
+def _archive_complaint(complaint_id: str, db: Session, history_db: Session):
     try:
-        # 1. Fetch the complaint from active DB
-        active_complaint = db.query(DBComplaint).filter(
-            DBComplaint.complaint_id == complaint_id
-        ).first()
-        
-        if not active_complaint:
-            raise HTTPException(status_code=404, detail="Complaint not found")
-        
-        # 2. Check if already in history
-        existing_history = history_db.query(HistoryComplaint).filter(
-            HistoryComplaint.complaint_id == complaint_id
-        ).first()
-        
-        if existing_history:
-            # Already archived, just return success
-            return {"message": "Complaint already in history", "complaint_id": complaint_id}
-        
-        # 3. Create history record
-        history_data = {
-            "complaint_id": active_complaint.complaint_id,
-            "complaint_timestamp": active_complaint.complaint_timestamp,
-            "victim_state": active_complaint.victim_state,
-            "victim_district": active_complaint.victim_district,
-            "victim_taluka": active_complaint.victim_taluka,
-            "victim_village": active_complaint.victim_village,
-            "victim_pincode": active_complaint.victim_pincode,
-            "victim_rural_urban": active_complaint.victim_rural_urban,
-            "victim_lat": active_complaint.victim_lat,
-            "victim_lon": active_complaint.victim_lon,
-            "channel": active_complaint.channel,
-            "fraud_type": active_complaint.fraud_type,
-            "bank_name": active_complaint.bank_name,
-            "reported_loss_amount": active_complaint.reported_loss_amount,
-            "num_transactions": active_complaint.num_transactions,
-            "device_type": active_complaint.device_type,
-            "urgency_score": active_complaint.urgency_score,
-            "account_age_months": active_complaint.account_age_months,
-            "prior_complaints_same_upi": active_complaint.prior_complaints_same_upi,
-            "linked_fraud_ring": active_complaint.linked_fraud_ring,
-            "status": "Forwarded to Bank",
-            "resolution_date": datetime.now(),
-            "resolution_notes": "Automatically archived after forwarding to bank"
-        }
-        
-        history_complaint = HistoryComplaint(**history_data)
-        history_db.add(history_complaint)
-        history_db.commit()
-        
-        # 4. Delete from active complaints
-        db.delete(active_complaint)
-        db.commit()
-        
+        result = archive_complaints(db, history_db, [complaint_id])
+    except Exception as e:
+        logger.exception("Archive Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if result["not_found"]:
+        raise HTTPException(status_code=404, detail="Complaint not found")
+    if result["already_archived"]:
+        return {"message": "Complaint already in history", "complaint_id": complaint_id}
+    if result["pending_delete"]:
+        # In history; the live row is removed when the outbox is replayed
         return {
-            "message": "Complaint archived successfully",
+            "message": "Complaint archived; removal from live complaints is pending",
             "complaint_id": complaint_id,
-            "status": "Forwarded to Bank"
+            "status": ARCHIVED_STATUS,
+            "pending_delete": True,
         }
-        
-    except HTTPException:
-        raise
+    return {
+        "message": "Complaint archived successfully",
+        "complaint_id": complaint_id,
+        "status": ARCHIVED_STATUS
+    }
+
+
+class ArchiveRequest(BaseModel):
+    complaint_ids: List[str]
+
+
+@app.post("/api/complaints/archive")
+async def archive_complaints_to_history(
+    request: ArchiveRequest,
+    db: Session = Depends(get_db),
+    history_db: Session = Depends(get_history_db)
+):
+    """
+    Archive many complaints at once (e.g. a batch forwarded to a bank).
+    Moved in chunks of ARCHIVE_CHUNK_SIZE with set-based statements.
+    """
+    try:
+        result = await run_in_threadpool(archive_complaints, db, history_db, request.complaint_ids)
     except Exception as e:
-        import traceback
-        print(f"Archive Error: {e}\n{traceback.format_exc()}")
+        _log_error("Archive", e)
         raise HTTPException(status_code=500, detail=str(e))
+    return {**result, "status": ARCHIVED_STATUS}
+
+HISTORY_PAGE_MAX = 1000
+HISTORY_COLUMNS = [c.name for c in HistoryComplaint.__table__.columns]
+HISTORY_SORTABLE = {
+    "complaint_timestamp", "resolution_date", "reported_loss_amount",
+    "urgency_score", "complaint_id", "status",
+}
+
+
+def history_filters(
+    status: Optional[str] = None,
+    district: Optional[str] = None,
+    fraud_type: Optional[str] = None,
+    bank: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> list:
+    """Shared /api/history filters; each maps onto an indexed column."""
+    conditions = []
+    if status:
+        conditions.append(HistoryComplaint.status == status)
+    if district:
+        conditions.append(HistoryComplaint.victim_district == district)
+    if fraud_type:
+        conditions.append(HistoryComplaint.fraud_type == fraud_type)
+    if bank:
+        conditions.append(HistoryComplaint.bank_name == bank)
+    if date_from:
+        conditions.append(HistoryComplaint.complaint_timestamp >= date_from)
+    if date_to:
+        conditions.append(HistoryComplaint.complaint_timestamp <= date_to)
+    return conditions
+
+
+def _encode_history_cursor(sort: str, order: str, value, complaint_id: str) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps({"sort": sort, "order": order, "v": value, "id": complaint_id}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_history_cursor(cursor: str, sort: str, order: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if (data["sort"], data["order"]) != (sort, order):
+            raise ValueError("cursor belongs to another sort order")
+        value = data["v"]
+        if value is not None and isinstance(getattr(HistoryComplaint, sort).type, DateTime):
+            value = datetime.fromisoformat(value)
+        return value, str(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _history_segments(sort: str, order: str, after):
+    """
+    (conditions, order_by) per block of the (sort, complaint_id) order,
+    starting at the cursor. NULL sort values rank lowest, as SQLite sorts
+    them: the NULL block comes first when ascending, last when descending.
+    Each block is a plain seek on ix_history_<sort>_complaint_id; an OR
+    across the blocks would make SQLite sort the whole match instead.
+    """
+    key = HistoryComplaint.complaint_id
+    if sort == "complaint_id":  # unique already: no tie-breaker, no NULLs
+        after_key = [] if after is None else [key > after[1] if order == "asc" else key < after[1]]
+        return [(after_key, [key.asc() if order == "asc" else key.desc()])]
+
+    col = getattr(HistoryComplaint, sort)
+    value, last_id = after if after is not None else (None, None)
+    if order == "asc":
+        nulls = ([col.is_(None)] + ([key > last_id] if after is not None else []), [key.asc()])
+        values = ([col.isnot(None)] + ([tuple_(col, key) > (value, last_id)] if value is not None else []),
+                  [col.asc(), key.asc()])
+        # a non-NULL cursor is already past the NULL block
+        return [values] if value is not None else [nulls, values]
+
+    values = ([col.isnot(None)] + ([tuple_(col, key) < (value, last_id)] if after is not None else []),
+              [col.desc(), key.desc()])
+    nulls = ([col.is_(None)] + ([key < last_id] if after is not None and value is None else []), [key.desc()])
+    # a NULL cursor is already inside the trailing NULL block
+    return [nulls] if after is not None and value is None else [values, nulls]
+
 
 @app.get("/api/history")
-def get_history_complaints(db: Session = Depends(get_history_db)):
-    complaints = db.query(HistoryComplaint).all()
-    # Manual serialization to handle datetime and status
-    res = []
-    for c in complaints:
-        d = c.__dict__.copy()
-        if "_sa_instance_state" in d:
-            del d["_sa_instance_state"]
+async def get_history_complaints(
+    filters: list = Depends(history_filters),
+    sort: str = Query("complaint_timestamp", description=f"One of {sorted(HISTORY_SORTABLE)}"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=HISTORY_PAGE_MAX, description="Page size; omit to stream every match"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+):
+    """
+    Archived complaints, filtered and sorted in SQL by (sort, complaint_id).
+
+    With `limit`, one page is returned and the cursor for the next page is
+    sent in the X-Next-Cursor header (absent on the last page); each page
+    seeks through the ix_history_<sort>_complaint_id index instead of
+    skipping rows. Without it, every match is streamed as a JSON array.
+    Use /api/history/count for the total behind the pages.
+    """
+    if sort not in HISTORY_SORTABLE:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {sort}")
+    after = _decode_history_cursor(cursor, sort, order) if cursor else None
+    segments = _history_segments(sort, order, after)
+    columns = [getattr(HistoryComplaint, name) for name in HISTORY_COLUMNS]
+
+    def iter_rows(session: Session, max_rows=None):
+        for conditions, order_by in segments:
+            q = session.query(*columns).filter(*filters, *conditions).order_by(*order_by)
+            if max_rows is not None:
+                rows = q.limit(max_rows).all()
+                max_rows -= len(rows)
+                yield from rows
+                if max_rows <= 0:
+                    return
+            else:
+                yield from q.yield_per(500)
+
+    def as_dict(row):
+        d = dict(zip(HISTORY_COLUMNS, row))
         # map complaint_timestamp to time_of_complaint if frontend expects it
         d['time_of_complaint'] = d.get('complaint_timestamp')
-        res.append(d)
-    return res
+        return d
+
+    if limit is not None:
+        # One page: fetch one extra row to know whether another page exists
+        def fetch_page():
+            session = SessionHistory()
+            try:
+                return [as_dict(r) for r in iter_rows(session, limit + 1)]
+            finally:
+                session.close()
+
+        rows = await run_in_threadpool(fetch_page)
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            headers["X-Next-Cursor"] = _encode_history_cursor(sort, order, last[sort], last["complaint_id"])
+        body = b"".join(iter_json_array(rows))
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stream():
+        # Own session: the request-scoped one may be closed before streaming ends
+        session = SessionHistory()
+        try:
+            yield from iter_json_array(as_dict(r) for r in iter_rows(session))
+        finally:
+            session.close()
+
+    return StreamingResponse(stream(), media_type="application/json")
+
+
+@app.get("/api/history/count")
+async def count_history_complaints(
+    filters: list = Depends(history_filters),
+    db: Session = Depends(get_history_db),
+):
+    """Number of archived complaints matching the /api/history filters."""
+    def count():
+        return db.query(func.count(HistoryComplaint.id)).filter(*filters).scalar()
+
+    return {"count": await run_in_threadpool(count)}
@@ -0,0 +1,243 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from .config import settings
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # optional dependency
+    otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter, one series per label tuple."""
+
+    kind = "counter"
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1.0):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, list(zip(self.labelnames, labels)), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus layout), one series per label tuple."""
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        if not self.registry.enabled:
+            return
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [per-bucket counts (+ overflow slot), sum, count]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def summary(self):
+        """{label tuple: (count, avg, sum)} for JSON stats endpoints."""
+        with self._lock:
+            return {labels: (count, total / count if count else 0.0, total)
+                    for labels, (_, total, count) in self._series.items()}
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(counts), total, count)
+                     for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in items:
+            base = list(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                yield f"{self.name}_bucket", base + [("le", _number(bound))], cumulative
+            yield f"{self.name}_sum", base, total
+            yield f"{self.name}_count", base, count
+
+
+class _StageTimer:
+    """Times one pipeline stage into the stage histogram, optionally inside a span."""
+
+    __slots__ = ("registry", "stage", "started", "span")
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+        self.span = None
+
+    def __enter__(self):
+        if self.registry.tracer is not None:
+            self.span = self.registry.tracer.start_as_current_span(f"cipher.{self.stage}")
+            self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.stage_seconds.observe(time.perf_counter() - self.started, self.stage)
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+class MetricsRegistry:
+    """
+    In-process metrics: counters and histograms updated on the request
+    path, plus collectors that turn the existing stats() dicts (prediction
+    cache, scoring pool, batcher, DB pools) into gauges at scrape time.
+
+    With metrics and tracing disabled, stage() hands out one shared no-op
+    context manager and inc()/observe() return immediately, so the
+    instrumentation left in the hot path costs a call and a flag check.
+    Under gunicorn every worker keeps (and serves) its own numbers.
+    """
+
+    def __init__(self, enabled=True, tracing=False):
+        self.enabled = enabled
+        self.tracer = None
+        if tracing:
+            if otel_trace is None:
+                logger.warning("OTEL_TRACING is set but opentelemetry is not installed; spans disabled")
+            else:
+                self.tracer = otel_trace.get_tracer("cipher")
+        self._metrics = []
+        self._collectors = []
+        self._noop = nullcontext()
+        self.stage_seconds = self.histogram(
+            "cipher_stage_seconds", "Time spent in each scoring pipeline stage", ("stage",))
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(self, name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(self, name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, prefix, fn):
+        """Export fn()'s stats dict as `<prefix>_<key>` gauges on every scrape."""
+        self._collectors.append((prefix, fn))
+
+    def stage(self, name):
+        """Context manager timing one pipeline stage (no-op when disabled)."""
+        if not self.enabled and self.tracer is None:
+            return self._noop
+        return _StageTimer(self, name)
+
+    def stage_summary(self):
+        """{stage: {"count", "avg_ms", "total_ms"}} for /api/scoring/stats."""
+        return {
+            labels[0]: {"count": count, "avg_ms": avg * 1000.0, "total_ms": total * 1000.0}
+            for labels, (count, avg, total) in self.stage_seconds.summary().items()
+        }
+
+    def _collected(self, prefix, stats):
+        """(name, labels, value) gauges for one stats dict; non-numeric values are skipped."""
+        for key, value in stats.items():
+            name = _INVALID_NAME_CHARS.sub("_", f"{prefix}_{key}")
+            if isinstance(value, dict):
+                # e.g. the batcher's size histogram: one labelled series per entry
+                for sub_key, sub_value in value.items():
+                    if isinstance(sub_value, (int, float)):
+                        yield name, [("key", sub_key)], sub_value
+            elif isinstance(value, str):
+                yield f"{name}_info", [("value", value)], 1
+            elif isinstance(value, (int, float)):  # bool included
+                yield name, [], value
+
+    def render(self):
+        """Everything in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for prefix, fn in self._collectors:
+            try:
+                stats = fn()
+            except Exception:
+                logger.exception("Metrics collector %s failed", prefix)
+                continue
+            typed = set()
+            for name, labels, value in self._collected(prefix, stats):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} gauge")
+                    typed.add(name)
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED, tracing=settings.OTEL_TRACING)
+
+HTTP_REQUESTS = metrics.counter(
+    "cipher_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "cipher_http_request_seconds", "HTTP request latency by route", ("method", "route"))
+SCORED_PAIRS = metrics.counter(
+    "cipher_scored_pairs_total", "Complaint-ATM pairs passed to model.predict")
+SCORED_COMPLAINTS = metrics.counter(
+    "cipher_scored_complaints_total", "Complaints ranked, by prediction cache outcome", ("cache",))
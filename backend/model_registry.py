@@ -0,0 +1,109 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from types import MappingProxyType
+
+from .config import settings
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def compile_encoder_tables(encoders):
+    """
+    Freeze each fitted LabelEncoder into a read-only {class: code} table so
+    prediction never rebuilds the mapping from `le.classes_`.
+    """
+    return MappingProxyType({
+        col: MappingProxyType({cls: idx for idx, cls in enumerate(le.classes_)})
+        for col, le in encoders.items()
+    })
+
+
+class ModelRegistry:
+    """
+    Keeps the ranker bundle (model + encoders + feature list) resident in
+    memory and hot-swaps it when the pickle on disk changes.
+
+    Callers take one bundle per request via get() and keep using that
+    reference; a reload only rebinds the registry's pointer, so in-flight
+    requests finish on the version they started with.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._bundle = None
+        self._stat_key = None      # (mtime_ns, size) of the loaded file
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        bundle = self._bundle
+        return bundle["version"] if bundle is not None else None
+
+    def load(self):
+        """Load the bundle unconditionally (used at startup)."""
+        self._refresh(force=True)
+        return self._bundle
+
+    def get(self):
+        """Return the current bundle, reloading first if the file changed."""
+        now = time.monotonic()
+        if self._bundle is None or now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self._refresh()
+        return self._bundle
+
+    def _refresh(self, force=False):
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except OSError as e:
+                if self._bundle is None:
+                    raise
+                logger.warning("Cannot stat %s, keeping bundle %s: %s", self.path, self.version, e)
+                return
+
+            stat_key = (st.st_mtime_ns, st.st_size)
+            if not force and self._bundle is not None and stat_key == self._stat_key:
+                return
+
+            with open(self.path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+
+            if not force and self._bundle is not None and digest == self._bundle["sha256"]:
+                # File was touched/rewritten with identical content
+                self._stat_key = stat_key
+                return
+
+            try:
+                with metrics.stage("bundle_load"):
+                    bundle = pickle.loads(data)
+                    bundle["encoder_tables"] = compile_encoder_tables(bundle["encoders"])
+            except Exception as e:
+                # Typically a half-written file while train_ranker.py saves;
+                # keep serving the old bundle and retry on the next check.
+                if self._bundle is None:
+                    raise
+                logger.warning("Failed to load %s, keeping bundle %s: %s", self.path, self.version, e)
+                return
+
+            bundle["sha256"] = digest
+            bundle["version"] = digest[:12]
+
+            # Atomic pointer swap: readers see either the old or the new dict
+            self._bundle = bundle
+            self._stat_key = stat_key
+            logger.info("Loaded bundle %s from %s", bundle["version"], self.path)
+
+
+model_registry = ModelRegistry(
+    settings.MODEL_BUNDLE_PATH,
+    check_interval=settings.MODEL_RELOAD_CHECK_SECONDS,
+)
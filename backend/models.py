@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, BigInteger, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, BigInteger, Text, Boolean, Index
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -45,6 +45,15 @@ class Complaint(Base):
     prior_complaints_same_upi = Column(Integer)
     linked_fraud_ring = Column(String)
 
+    __table_args__ = (
+        # Keyset pagination of GET /api/complaints: ORDER BY
+        # complaint_timestamp NULLS FIRST, complaint_id (and the row
+        # comparison after the cursor) read straight off this index.
+        # NULLS FIRST is Postgres-only syntax; SQLite sorts NULLs first anyway.
+        Index("ix_complaints_timestamp_id", complaint_timestamp, complaint_id,
+              postgresql_ops={"complaint_timestamp": "NULLS FIRST"}),
+    )
+
 class RankPair(Base):
     __tablename__ = "rank_pairs"
     
@@ -85,3 +94,34 @@ class RankPair(Base):
     # So `RankPair` table is mainly for future training or data integrity.
 
 
+
+class ATMMasterVersion(Base):
+    __tablename__ = "atm_master_version"
+
+    # Single-row table (id=1). Bumped by every reseed/refresh of `atms` so
+    # prediction-side snapshots and caches know when to rebuild.
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SeedCheckpoint(Base):
+    __tablename__ = "seed_checkpoint"
+
+    # Progress of backend/seed.py per target table, committed with each
+    # chunk so an interrupted reseed resumes instead of starting over.
+    name = Column(String, primary_key=True)
+    source = Column(String)  # path:size:mtime of the CSV being loaded
+    rows_loaded = Column(BigInteger, nullable=False, default=0)
+    completed = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime(timezone=True))
+
+
+def ensure_indexes(engine):
+    """
+    create_all() only indexes new tables; add indexes declared since an
+    existing live database was created.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,81 @@
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool
+
+# Checkouts that had to wait at least this long are counted as "slow"
+SLOW_CHECKOUT_SECONDS = 0.010
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long callers wait for a connection.
+
+    A growing wait time or saturation close to 1.0 means requests are
+    queueing on the pool rather than on the database: raise pool size /
+    overflow, or find who holds connections too long.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.checkouts = 0
+        self.slow_checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.max_checked_out = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            with self._metrics_lock:
+                self.timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        checked_out = self.checkedout()
+        with self._metrics_lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            if waited >= SLOW_CHECKOUT_SECONDS:
+                self.slow_checkouts += 1
+            self.max_checked_out = max(self.max_checked_out, checked_out)
+        return conn
+
+    def recreate(self):
+        # engine.dispose() replaces the pool; keep the counters going
+        pool = super().recreate()
+        with self._metrics_lock:
+            for name in ("checkouts", "slow_checkouts", "timeouts",
+                         "wait_total", "wait_max", "max_checked_out"):
+                setattr(pool, name, getattr(self, name))
+        return pool
+
+    def stats(self):
+        capacity = self.size() + max(self._max_overflow, 0)
+        checked_out = self.checkedout()
+        with self._metrics_lock:
+            return {
+                "size": self.size(),
+                "max_overflow": self._max_overflow,
+                "checked_out": checked_out,
+                "overflow": self.overflow(),
+                "saturation": (checked_out / capacity) if capacity else 0.0,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "slow_checkouts": self.slow_checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": (self.wait_total / self.checkouts * 1000.0) if self.checkouts else 0.0,
+                "max_wait_ms": self.wait_max * 1000.0,
+            }
+
+
+def pool_stats(engine):
+    """Stats for an engine's pool, or just its status line for other pool classes."""
+    pool = engine.pool
+    if isinstance(pool, TimedQueuePool):
+        return pool.stats()
+    return {"status": pool.status()}
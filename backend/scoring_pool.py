@@ -0,0 +1,74 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import settings
+
+
+class ScoringPoolBusy(Exception):
+    """Raised when the scoring queue is full; the API maps it to HTTP 503."""
+
+
+class ScoringPool:
+    """
+    Dedicated, size-bounded executor for CPU-bound model scoring.
+
+    Scoring never runs on the event loop or the shared threadpool that
+    serves cheap DB endpoints. At most `workers` jobs run at once and at
+    most `max_queue` more may wait; beyond that submit() fails fast with
+    ScoringPoolBusy instead of letting latency grow without bound.
+    Threads (not processes) are used because LightGBM and NumPy release
+    the GIL and the model/ATM snapshot are shared in-process.
+    """
+
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scoring")
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def pending(self):
+        """Jobs running or queued."""
+        return self._pending
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise ScoringPoolBusy(f"{self._pending} scoring jobs in flight")
+            self._pending += 1
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # Slot is freed when the job really finishes, even if the client
+        # disconnects and the awaiting request is cancelled first.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+scoring_pool = ScoringPool(
+    workers=settings.SCORING_WORKERS or min(4, os.cpu_count() or 1),
+    max_queue=settings.SCORING_MAX_QUEUE,
+)
@@ -3,14 +3,33 @@ import os
 import pandas as pd
 import json
 from datetime import datetime
+import feature_store
+from backend.config import settings
 from backend.database import SessionLocal, engine, Base
-from backend.models import ATM, Complaint, RankPair
+from backend.models import Complaint, RankPair
+from backend.atm_refresh import refresh_atm_master
+from backend.bulk_load import load_csv, pick_column, as_int, as_float
 
 # Path to files
 ATM_MASTER_PATH = "cipher_atm_master.csv"
 RANK_PAIRS_PATH = "cipher_rank_pairs.csv"
 SAMPLE_COMPLAINTS_JS_PATH = "src/page/sampleComplaints.js"
 
+
+# Only these are read from the rank pairs source
+RANK_PAIR_SOURCE_COLUMNS = ["complaint_id", "atm_id", "label", "atm_distance_km"]
+
+
+def map_rank_pair_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Rank pairs CSV -> the `rank_pairs` columns we keep."""
+    return pd.DataFrame({
+        "complaint_id": pick_column(df, "complaint_id"),
+        "atm_id": as_int(pick_column(df, "atm_id")),
+        "label": as_int(pick_column(df, "label")),
+        "atm_distance_km": as_float(pick_column(df, "atm_distance_km")),
+    })
+
+
 def seed_data():
     # 1. Init DB
     print("Creating tables...")
@@ -19,77 +38,24 @@ def seed_data():
     db = SessionLocal()
     
     try:
-        # 2. Seed ATMs
-        # Truncate first to fix bad data
-        db.query(ATM).delete()
-        db.commit()
-        print("Truncated ATMs table.")
-
-        print(f"Seeding ATMs from {ATM_MASTER_PATH}...")
-        if os.path.exists(ATM_MASTER_PATH):
-            df_atm = pd.read_csv(ATM_MASTER_PATH)
-            
-            # Clean columns
-            df_atm.columns = [c.strip() for c in df_atm.columns]
-            print("CSV Columns:", df_atm.columns.tolist())
-            
-            records = []
-            for _, row in df_atm.iterrows():
-                # Map CSV -> Model
-                r = {
-                    "suspected_atm_index": row.get("atm_id") if "atm_id" in row else row.get("suspected_atm_index"),
-                    "suspected_atm_lat": row.get("atm_lat") if "atm_lat" in row else row.get("suspected_atm_lat"),
-                    "suspected_atm_lon": row.get("atm_lon") if "atm_lon" in row else row.get("suspected_atm_lon"),
-                    "suspected_atm_place": row.get("suspected_atm_place"),
-                    "suspected_atm_name": row.get("suspected_atm_name"),
-                    "atm_total_complaints": row.get("atm_total_complaints"),
-                    "atm_avg_loss": row.get("atm_avg_loss"),
-                }
-                records.append(r)
-            
-            if len(records) > 0:
-                print("Mapped Record:", records[0])
-
-            objects = [ATM(**r) for r in records]
-            db.add_all(objects)
-            db.commit()
-            print(f"Seeded {len(records)} ATMs.")
+        # 2. Seed ATMs: loaded into a shadow table and swapped in, so
+        #    predictions keep using the old master until the new one is complete
+        #    (the columnar feature store is preferred over the CSV when built)
+        atm_source = feature_store.resolve_source(ATM_MASTER_PATH, feature_store.ATM_MASTER)
+        print(f"Seeding ATMs from {atm_source}...")
+        if os.path.exists(atm_source):
+            refresh_atm_master(db, atm_source, settings.SEED_CHUNK_SIZE)
         else:
             print("ATM Master file not found.")
 
-        # 3. Seed Rank Pairs
-        # This file is large (75MB), verify if needed or partial.
-        # User said "Seed all these tables". 
-        if db.query(RankPair).count() == 0:
-            print(f"Seeding RankPairs from {RANK_PAIRS_PATH}...")
-            if os.path.exists(RANK_PAIRS_PATH):
-                # We might need to handle chunking if it's too big, but 75MB is okay for pandas + postgres usually.
-                # Just reading necessary columns.
-                df_rank = pd.read_csv(RANK_PAIRS_PATH)
-                
-                # Filter to columns we actually defined in RankPair model to avoiding errors if we didn't define all
-                # Our RankPair model has: complaint_id, atm_id, label, atm_distance_km
-                # Plus maybe day_of_week etc if we added them. 
-                # Let's map specifically to avoid 'column x not found' error.
-                
-                records = []
-                for _, row in df_rank.iterrows():
-                    records.append({
-                        "complaint_id": row.get("complaint_id"),
-                        "atm_id": row.get("atm_id"),
-                        "label": row.get("label"),
-                        "atm_distance_km": row.get("atm_distance_km"),
-                        # Add day_of_week if we added it to model, otherwise ignore.
-                        # I'll stick to what I defined in `RankPair` in models.py
-                    })
-                
-                db.bulk_insert_mappings(RankPair, records)
-                db.commit()
-                print(f"Seeded {len(records)} RankPairs.")
-            else:
-                print("Rank Pairs file not found.")
+        # 3. Seed Rank Pairs (~75MB): streamed in chunks, resumable
+        rank_source = feature_store.resolve_source(RANK_PAIRS_PATH, feature_store.RANK_PAIRS)
+        print(f"Seeding RankPairs from {rank_source}...")
+        if os.path.exists(rank_source):
+            load_csv(db, rank_source, RankPair, map_rank_pair_chunk, settings.SEED_CHUNK_SIZE,
+                     columns=RANK_PAIR_SOURCE_COLUMNS)
         else:
-            print("RankPairs already seeded.")
+            print("Rank Pairs file not found.")
 
         # 4. Seed Complaints from JS
         # We need to parse src/page/sampleComplaints.js
@@ -0,0 +1,129 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+
+from .metrics import metrics
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; stdlib json is the fallback
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def finite_list(values, fill=0.0):
+    """Float column -> list with NaN/inf replaced by `fill` (vectorized)."""
+    arr = np.asarray(values, dtype=np.float64)
+    return np.where(np.isfinite(arr), arr, fill).tolist()
+
+
+def int_list(values, fill=0):
+    """Numeric column -> list of ints, NaN/inf replaced by `fill`."""
+    arr = np.asarray(values, dtype=np.float64)
+    return np.where(np.isfinite(arr), arr, fill).astype(np.int64).tolist()
+
+
+def iter_json_array(items, chunk_size=500):
+    """Encode an iterable of dicts as one JSON array, yielded in chunks."""
+    yield b"["
+    buf = []
+    first = True
+    for item in items:
+        buf.append(dumps(item))
+        if len(buf) >= chunk_size:
+            yield (b"" if first else b",") + b",".join(buf)
+            first = False
+            buf = []
+    if buf:
+        yield (b"" if first else b",") + b",".join(buf)
+    yield b"]"
+
+
+def iter_ndjson(items, chunk_size=500):
+    """Encode an iterable of dicts as newline-delimited JSON, in chunks."""
+    buf = []
+    for item in items:
+        buf.append(dumps(item))
+        if len(buf) >= chunk_size:
+            yield b"\n".join(buf) + b"\n"
+            buf = []
+    if buf:
+        yield b"\n".join(buf) + b"\n"
+
+
+def hotspot_rows(df, complaint: dict) -> list:
+    """
+    Convert a predict_atm_risk result frame into ATMRisk dicts, column by
+    column: NaN/inf are zeroed vectorized and every value is already a
+    native Python type, so no per-row pandas access or validation.
+    `complaint` is the model input dict (complaint_id, fraud_type,
+    bank_name, complaint_timestamp).
+    """
+    columns = zip(
+        int_list(df["atm_id"]),
+        df["atm_name_display"].tolist(),
+        finite_list(df["atm_lat"]),
+        finite_list(df["atm_lon"]),
+        finite_list(df["risk_score_raw"]),
+        finite_list(df["risk_score_norm"]),
+        df["risk_class"].tolist(),
+        int_list(df["rank_order"]),
+        df["atm_place_display"].tolist(),
+        int_list(df["atm_total_complaints"]),
+        finite_list(df["atm_avg_loss"]),
+    )
+    fraud_type = complaint["fraud_type"]
+    bank_name = complaint["bank_name"]
+    complaint_id = complaint["complaint_id"]
+    time_of_complaint = complaint["complaint_timestamp"]
+    return [
+        {
+            "atm_id": atm_id,
+            "atm_name": atm_name,
+            "lat": lat,
+            "lon": lon,
+            "risk_score": risk_score,
+            "risk_score_norm": risk_score_norm,
+            "risk_class": risk_class,
+            "rank": rank,
+
+            # from complaint / ATM master
+            "fraud_type": fraud_type,
+            "suspected_atm_place": place,
+            "total_complaints": total_complaints,
+            "bank_name": bank_name,
+            "estimated_loss": estimated_loss,
+
+            # meta
+            "complaint_id": complaint_id,
+            "time_of_complaint": time_of_complaint,
+        }
+        for (atm_id, atm_name, lat, lon, risk_score, risk_score_norm, risk_class,
+             rank, place, total_complaints, estimated_loss) in columns
+    ]
+
+
+def dump_hotspots(complaints, frames) -> bytes:
+    """The hotspot endpoints' body: { complaint_id: [ATMRisk, ...] }."""
+    with metrics.stage("serialize"):
+        return dumps({
+            complaint["complaint_id"]: hotspot_rows(df, complaint)
+            for complaint, df in zip(complaints, frames)
+        })
@@ -0,0 +1,111 @@
+import json
+import os
+import pickle
+import shutil
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishing is unlocked there
+    fcntl = None
+
+MANIFEST = "manifest.json"
+OBJECT_COLUMNS = "objects.pkl"
+LOCK_FILE = ".publish.lock"
+PREFIX = "atm-v"
+
+
+def _snapshot_dir(root, version):
+    return os.path.join(root, f"{PREFIX}{version}")
+
+
+@contextmanager
+def _publish_lock(root):
+    """Exclusive lock across worker processes around publish + prune."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(root, LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def export_arrays(root, version, arrays):
+    """
+    Publish snapshot arrays under root/atm-v<version>/ for other worker
+    processes. Numeric columns become .npy files that readers memory-map,
+    so every worker shares the same page-cache pages; object (string)
+    columns are small and pickled. The directory appears atomically
+    (rename), and if another worker published the same version first its
+    copy wins.
+    """
+    final = _snapshot_dir(root, version)
+    if os.path.isdir(final):
+        return final
+
+    os.makedirs(root, exist_ok=True)
+    tmp = f"{final}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    numeric, objects = [], {}
+    for name, arr in arrays.items():
+        if arr.dtype == object:
+            objects[name] = arr
+        else:
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(arr))
+            numeric.append(name)
+    with open(os.path.join(tmp, OBJECT_COLUMNS), "wb") as f:
+        pickle.dump(objects, f, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"version": version, "numeric": numeric, "objects": list(objects)}, f)
+
+    with _publish_lock(root):
+        try:
+            os.rename(tmp, final)
+        except OSError:
+            # Lost the race to another worker: theirs is identical
+            shutil.rmtree(tmp, ignore_errors=True)
+        _prune(root, version)
+    return final
+
+
+def load_arrays(root, version):
+    """
+    Map a published snapshot (read-only, zero-copy for numeric columns).
+    Returns None if this version has not been published yet.
+    """
+    path = _snapshot_dir(root, version)
+    manifest_path = os.path.join(path, MANIFEST)
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    with open(os.path.join(path, OBJECT_COLUMNS), "rb") as f:
+        objects = pickle.load(f)
+
+    arrays = {}
+    for name in manifest["numeric"]:
+        arrays[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+    for name in manifest["objects"]:
+        arr = objects[name]
+        arr.setflags(write=False)
+        arrays[name] = arr
+    return arrays
+
+
+def _prune(root, version):
+    """
+    Drop versions older than `version` (best effort; mapped files may be
+    busy on Windows). Newer ones stay: a worker still on an old version
+    may publish after another has already moved on. Call under the lock.
+    """
+    for entry in os.listdir(root):
+        suffix = entry[len(PREFIX):]
+        if entry.startswith(PREFIX) and suffix.isdigit() and int(suffix) < version:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
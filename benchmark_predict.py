@@ -0,0 +1,361 @@
+"""
+Latency / memory / ranking-quality benchmark for predict.py and a saved
+ranker bundle.
+
+For each ATM-master scale (default 1k, 10k, 100k synthetic ATMs) it
+reports:
+  - load: bundle unpickle, snapshot build, geo index, distance terms
+  - per-stage timings of one scoring pass, read from the stage histograms
+    predict.py and backend/serialization.py record (backend/metrics.py):
+    candidates, features (including encode), predict, select, classify,
+    serialize
+  - throughput and p50/p95 latency at batch sizes 1/16/256
+  - tracemalloc peak (Python + NumPy allocations) per batch size, taken
+    in a separate, untimed pass
+With --pairs, ranking metrics (NDCG@5/10, MRR, recall@50) are computed on
+the held-out complaints of a pairs set, encoded with the bundle's own
+encoders.
+
+Everything goes to a JSON report. --compare prints the relative change
+of every number against an earlier report:
+
+    python benchmark_predict.py --pairs cipher_rank_pairs.csv --out bench.json
+    python benchmark_predict.py --out bench_new.json --compare bench.json
+
+Scoring goes through predict.rank_complaints() and
+serialization.dump_hotspots() - the API's own code - with the synthetic
+snapshot and no prediction cache, so the database is not involved.
+"""
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: no max RSS figure
+    resource = None
+
+import predict
+from backend.atm_snapshot import build_snapshot
+from backend.metrics import metrics
+from backend.model_registry import ModelRegistry
+from backend.serialization import dump_hotspots
+from distance import LEGACY_METHOD, pairwise_distance_km
+from ranking_metrics import ranking_metrics
+
+SCALES = (1_000, 10_000, 100_000)
+BATCH_SIZES = (1, 16, 256)
+# India-ish bounding box for synthetic coordinates
+LAT_RANGE = (8.0, 35.0)
+LON_RANGE = (68.0, 97.0)
+
+
+# ----------------------------------------------------------------------
+# Synthetic data
+# ----------------------------------------------------------------------
+
+def _vocabulary(bundle, col, fallback):
+    """Known categories for `col` (so encodings hit real codes), else `fallback`."""
+    table = bundle["encoder_tables"].get(col)
+    return list(table.keys()) if table else fallback
+
+
+def synthetic_atms(bundle, n, rng):
+    """Raw `atms` frame (DB column names) with `n` ATMs."""
+    names = _vocabulary(bundle, "suspected_atm_name", [f"ATM {i}" for i in range(100)])
+    places = _vocabulary(bundle, "suspected_atm_place", [f"Place {i}" for i in range(100)])
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "suspected_atm_index": np.arange(n),
+        "suspected_atm_lat": rng.uniform(*LAT_RANGE, n),
+        "suspected_atm_lon": rng.uniform(*LON_RANGE, n),
+        "suspected_atm_place": rng.choice(places, n),
+        "suspected_atm_name": rng.choice(names, n),
+        "atm_total_complaints": rng.integers(0, 50, n),
+        "atm_avg_loss": rng.uniform(1_000, 100_000, n).round(2),
+    })
+
+
+COMPLAINT_CATEGORICALS = {
+    "victim_state": ["Maharashtra"],
+    "victim_district": ["Pune", "Nagpur", "Aurangabad"],
+    "victim_taluka": ["Haveli", "Khuldabad"],
+    "victim_village": ["Bajarwadi", "Sadar"],
+    "victim_rural_urban": ["Rural", "Urban"],
+    "channel": ["NCRP", "Helpline", "Email"],
+    "fraud_type": ["OTP Fraud", "UPI Scam", "Card Skimming"],
+    "bank_name": ["SBI", "HDFC", "ICICI", "BoB"],
+    "device_type": ["Android", "iOS", "ATM"],
+    "linked_fraud_ring": ["None", "Ring_A", "Ring_B"],
+}
+
+
+def synthetic_complaints(bundle, n, rng):
+    complaints = []
+    for i in range(n):
+        c = {col: rng.choice(_vocabulary(bundle, col, values)) for col, values in COMPLAINT_CATEGORICALS.items()}
+        c.update({
+            "complaint_id": f"BENCH-{i}",
+            "complaint_timestamp": "2025-10-03 13:55:00",
+            "victim_pincode": int(rng.integers(400000, 450000)),
+            "victim_lat": float(rng.uniform(*LAT_RANGE)),
+            "victim_lon": float(rng.uniform(*LON_RANGE)),
+            "reported_loss_amount": float(rng.uniform(500, 200_000)),
+            "num_transactions": int(rng.integers(1, 10)),
+            "is_otp_shared": int(rng.integers(0, 2)),
+            "clicked_malicious_link": int(rng.integers(0, 2)),
+            "urgency_score": float(rng.uniform()),
+            "account_age_months": int(rng.integers(1, 120)),
+            "prior_complaints_same_upi": int(rng.integers(0, 3)),
+        })
+        complaints.append(c)
+    return complaints
+
+
+# ----------------------------------------------------------------------
+# Timing helpers
+# ----------------------------------------------------------------------
+
+def score_batch(complaints, snapshot, bundle, top_k):
+    """End-to-end path the API takes (minus cache and DB): ranked, then encoded."""
+    return dump_hotspots(complaints, predict.rank_complaints(complaints, snapshot, bundle, top_k))
+
+
+def stage_timings(complaints, snapshot, bundle, top_k):
+    """One scoring pass, split into the stages predict/serialization record."""
+    snapshot.encoded = {}  # cold ATM-side encodings
+    metrics.stage_seconds.reset()
+    score_batch(complaints, snapshot, bundle, top_k)
+    stages = metrics.stage_summary()
+    return {
+        "pairs_scored": sum(len(snapshot) if rows is None else len(rows)
+                            for rows in (predict.candidate_rows(c, snapshot, top_k) for c in complaints)),
+        "stages_ms": {stage: s["total_ms"] for stage, s in stages.items()},
+    }
+
+
+def _batches(complaints, batch_size, count):
+    pool = len(complaints)
+    for b in range(count):
+        start = (b * batch_size) % pool
+        yield [complaints[(start + j) % pool] for j in range(batch_size)]
+
+
+def throughput(complaints, snapshot, bundle, top_k, batch_size, min_complaints):
+    batches = max(1, -(-min_complaints // batch_size))
+    latencies = []
+
+    # Timed pass, without tracemalloc's per-allocation hook
+    started = time.perf_counter()
+    for batch in _batches(complaints, batch_size, batches):
+        t0 = time.perf_counter()
+        score_batch(batch, snapshot, bundle, top_k)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+    elapsed = time.perf_counter() - started
+
+    # Untimed pass for the allocation peak of one batch
+    tracemalloc.start()
+    score_batch(next(_batches(complaints, batch_size, 1)), snapshot, bundle, top_k)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "batch_size": batch_size,
+        "batches": batches,
+        "complaints_per_s": batches * batch_size / elapsed,
+        "batch_latency_ms_p50": float(np.percentile(latencies, 50)),
+        "batch_latency_ms_p95": float(np.percentile(latencies, 95)),
+        "tracemalloc_peak_mb": peak / 2**20,
+    }
+
+
+def bench_scale(bundle, n_atms, args, rng):
+    load = {}
+    started = time.perf_counter()
+    raw = synthetic_atms(bundle, n_atms, rng)
+    load["generate_ms"] = (time.perf_counter() - started) * 1000.0
+
+    started = time.perf_counter()
+    snapshot = build_snapshot(n_atms, raw)
+    load["snapshot_ms"] = (time.perf_counter() - started) * 1000.0
+    started = time.perf_counter()
+    snapshot.geo_index
+    load["geo_index_ms"] = (time.perf_counter() - started) * 1000.0
+    started = time.perf_counter()
+    snapshot.coords(predict.settings.DISTANCE_DTYPE)
+    load["coords_ms"] = (time.perf_counter() - started) * 1000.0
+
+    complaints = synthetic_complaints(bundle, max(BATCH_SIZES), rng)
+    print(f"[BENCH] {n_atms:,} ATMs ...")
+    result = {
+        "atms": n_atms,
+        "load": load,
+        "single": stage_timings(complaints[:1], snapshot, bundle, args.top_k),
+        "batch": stage_timings(complaints[:max(args.batch_sizes)], snapshot, bundle, args.top_k),
+        "throughput": [
+            throughput(complaints, snapshot, bundle, args.top_k, size, args.min_complaints)
+            for size in args.batch_sizes
+        ],
+    }
+    for row in result["throughput"]:
+        print(f"[BENCH]   batch {row['batch_size']:>3}: {row['complaints_per_s']:,.1f} complaints/s, "
+              f"p95 {row['batch_latency_ms_p95']:.1f} ms, peak {row['tracemalloc_peak_mb']:.1f} MB")
+    return result
+
+
+# ----------------------------------------------------------------------
+# Ranking quality
+# ----------------------------------------------------------------------
+
+def encode_pairs(df, bundle):
+    """Pairs frame -> model matrix using the bundle's encoders and distance method."""
+    if {"victim_lat", "victim_lon", "atm_lat", "atm_lon"}.issubset(df.columns):
+        df["victim_atm_distance_km"] = pairwise_distance_km(
+            *(pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)
+              for c in ("victim_lat", "victim_lon", "atm_lat", "atm_lon")),
+            method=bundle.get("distance_method", LEGACY_METHOD),
+        )
+    tables = bundle["encoder_tables"]
+    X = np.zeros((len(df), len(bundle["feature_cols"])), dtype=np.float64)
+    for j, col in enumerate(bundle["feature_cols"]):
+        if col not in df.columns:
+            continue
+        if col in tables:
+            X[:, j] = predict.encode_array(tables[col], df[col].to_numpy())
+        else:
+            X[:, j] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+    return X
+
+
+def holdout_ids(ids, mode):
+    """Complaints the bundle was not trained on, per train_ranker split mode."""
+    if mode == "all":
+        return None
+    if mode == "hashed":
+        from pair_cache import test_mask
+
+        unique = pd.unique(ids)
+        return set(unique[test_mask(unique, 0.2)])
+    from sklearn.model_selection import train_test_split
+
+    _, test_ids = train_test_split(pd.unique(ids), test_size=0.2, random_state=42, shuffle=True)
+    return set(test_ids)
+
+
+def bench_ranking(bundle, pairs_path, holdout):
+    import feature_store
+
+    available = feature_store.columns_of(pairs_path)
+    wanted = set(bundle["feature_cols"]) | {"label", "complaint_id", "victim_lat", "victim_lon", "atm_lat", "atm_lon"}
+    df = feature_store.read_frame(pairs_path, columns=[c for c in available if c in wanted])
+    test = holdout_ids(df["complaint_id"].to_numpy(), holdout)
+    if test is not None:
+        df = df[df["complaint_id"].isin(test)]
+    df = df.sort_values("complaint_id", kind="stable")
+
+    started = time.perf_counter()
+    X = encode_pairs(df, bundle)
+    scores = bundle["model"].predict(X)
+    elapsed = time.perf_counter() - started
+    groups = df.groupby("complaint_id", sort=True).size().to_numpy()
+    quality = ranking_metrics(df["label"].to_numpy(), scores, groups)
+    quality.update({"pairs": len(df), "holdout": holdout, "encode_predict_ms": elapsed * 1000.0})
+    print(f"[BENCH] ranking on {quality['groups']:,} complaints: "
+          f"ndcg@10={quality['ndcg@10']:.4f} mrr={quality['mrr']:.4f} recall@50={quality['recall@50']:.4f}")
+    return quality
+
+
+# ----------------------------------------------------------------------
+# Report
+# ----------------------------------------------------------------------
+
+def _numbers(obj, prefix=""):
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            yield from _numbers(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(obj, list):
+        for i, value in enumerate(obj):
+            key = value.get("batch_size", value.get("atms", i)) if isinstance(value, dict) else i
+            yield from _numbers(value, f"{prefix}[{key}]")
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        yield prefix, float(obj)
+
+
+def compare(old, new):
+    before = dict(_numbers(old["results"]))
+    for key, value in _numbers(new["results"]):
+        if key in before and before[key]:
+            change = (value - before[key]) / abs(before[key]) * 100.0
+            print(f"{key:70s} {before[key]:14.3f} -> {value:14.3f} ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark predict.py against a ranker bundle.")
+    parser.add_argument("--bundle", default=predict.settings.MODEL_BUNDLE_PATH)
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(BATCH_SIZES))
+    parser.add_argument("--top-k", type=int, default=50, help="0 = full ranking")
+    parser.add_argument("--min-complaints", type=int, default=256,
+                        help="complaints scored per batch-size measurement")
+    parser.add_argument("--pairs", default=None, help="pairs CSV / feature-store dataset for ranking metrics")
+    parser.add_argument("--holdout", choices=("in-memory", "hashed", "all"), default="in-memory",
+                        help="which complaints of --pairs count as held out (train_ranker split mode)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmark_report.json")
+    parser.add_argument("--compare", default=None, help="earlier report to diff against")
+    args = parser.parse_args(argv)
+    args.top_k = args.top_k or None
+
+    # stage_timings() reads the stage histograms, whatever METRICS_ENABLED says
+    metrics.enabled = True
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+    registry = ModelRegistry(args.bundle, check_interval=float("inf"))
+    bundle = registry.load()
+    bundle_load_ms = (time.perf_counter() - started) * 1000.0
+
+    results = {"bundle_load_ms": bundle_load_ms, "scales": []}
+    for n_atms in args.scales:
+        results["scales"].append(bench_scale(bundle, n_atms, args, rng))
+    if args.pairs:
+        results["ranking"] = bench_ranking(bundle, args.pairs, args.holdout)
+
+    import lightgbm
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "bundle": os.path.abspath(args.bundle),
+            "bundle_version": bundle["version"],
+            "features": len(bundle["feature_cols"]),
+            "distance_method": bundle.get("distance_method", LEGACY_METHOD),
+            "top_k": args.top_k,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "lightgbm": lightgbm.__version__,
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if resource is not None:
+        report["meta"]["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"[SAVE] Benchmark report -> {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
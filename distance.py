@@ -0,0 +1,104 @@
+"""
+Victim <-> ATM distance kernel shared by training (train_ranker.py) and
+serving (predict.py), so `victim_atm_distance_km` is computed the same way
+on both sides.
+
+Two methods:
+  - "euclidean": the legacy flat approximation sqrt(dlat^2 + dlon^2) * 111,
+    kept because existing bundles were trained on it
+  - "haversine": great-circle distance on a spherical Earth
+
+Coordinates are turned into CoordTerms once (radians, half-angle sin/cos,
+cos(lat)); distances are then pure multiply-adds plus one arcsin, with no
+per-pair trig calls.
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.0
+
+EUCLIDEAN = "euclidean"
+HAVERSINE = "haversine"
+# Bundles that don't record a method were trained on the legacy formula
+LEGACY_METHOD = EUCLIDEAN
+METHODS = (EUCLIDEAN, HAVERSINE)
+
+
+class CoordTerms:
+    """Precomputed per-point terms for distance calculations."""
+
+    __slots__ = ("lat", "lon", "sin_half_lat", "cos_half_lat", "sin_half_lon", "cos_half_lon", "cos_lat")
+
+    def __init__(self, lat, lon, dtype=np.float64):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        half_lat = np.radians(lat) / 2.0
+        half_lon = np.radians(lon) / 2.0
+        self.lat = lat.astype(dtype, copy=False)
+        self.lon = lon.astype(dtype, copy=False)
+        self.sin_half_lat = np.sin(half_lat).astype(dtype, copy=False)
+        self.cos_half_lat = np.cos(half_lat).astype(dtype, copy=False)
+        self.sin_half_lon = np.sin(half_lon).astype(dtype, copy=False)
+        self.cos_half_lon = np.cos(half_lon).astype(dtype, copy=False)
+        self.cos_lat = np.cos(2.0 * half_lat).astype(dtype, copy=False)
+
+    @property
+    def dtype(self):
+        return self.lat.dtype
+
+    def take(self, rows):
+        """Terms for a subset of points (no trig recomputed)."""
+        out = CoordTerms.__new__(CoordTerms)
+        for name in CoordTerms.__slots__:
+            setattr(out, name, getattr(self, name)[rows])
+        return out
+
+    def column(self):
+        """Same terms shaped (m, 1), to broadcast m points against n others."""
+        out = CoordTerms.__new__(CoordTerms)
+        for name in CoordTerms.__slots__:
+            setattr(out, name, np.reshape(getattr(self, name), (-1, 1)))
+        return out
+
+
+def haversine_km(a: CoordTerms, b: CoordTerms):
+    """Great-circle distance between a and b (numpy broadcasting rules)."""
+    # sin((x - y) / 2) via the angle-difference identity on half angles
+    s_dlat = a.sin_half_lat * b.cos_half_lat - a.cos_half_lat * b.sin_half_lat
+    s_dlon = a.sin_half_lon * b.cos_half_lon - a.cos_half_lon * b.sin_half_lon
+    h = s_dlat * s_dlat + a.cos_lat * b.cos_lat * (s_dlon * s_dlon)
+    return (2.0 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def euclidean_km(a: CoordTerms, b: CoordTerms):
+    """Legacy flat approximation: degree distance * 111 km."""
+    dlat = a.lat - b.lat
+    dlon = a.lon - b.lon
+    return np.sqrt(dlat * dlat + dlon * dlon) * KM_PER_DEGREE
+
+
+def distance_km(a: CoordTerms, b: CoordTerms, method=LEGACY_METHOD):
+    if method == HAVERSINE:
+        return haversine_km(a, b)
+    if method == EUCLIDEAN:
+        return euclidean_km(a, b)
+    raise ValueError(f"Unknown distance method {method!r}, expected one of {METHODS}")
+
+
+def victim_atm_distance_km(victim_lat, victim_lon, atms: CoordTerms, method=LEGACY_METHOD, rows=None):
+    """
+    Distances from one victim (scalars -> shape (n,)) or many victims
+    (1-D arrays of length m -> shape (m, n)) to the ATMs in `atms`
+    (optionally only `rows`), in a single NumPy pass at atms' dtype.
+    """
+    if rows is not None:
+        atms = atms.take(rows)
+    victims = CoordTerms(victim_lat, victim_lon, dtype=atms.dtype)
+    if np.ndim(victim_lat) > 0:
+        victims = victims.column()
+    return distance_km(victims, atms, method)
+
+
+def pairwise_distance_km(lat1, lon1, lat2, lon2, method=LEGACY_METHOD, dtype=np.float64):
+    """Element-wise distances for aligned coordinate arrays (training pairs)."""
+    return distance_km(CoordTerms(lat1, lon1, dtype), CoordTerms(lat2, lon2, dtype), method)
@@ -0,0 +1,309 @@
+"""
+Columnar feature store for the rank pairs and the ATM master.
+
+    python feature_store.py build [--pairs cipher_rank_pairs.csv]
+                                  [--atms cipher_atm_master.csv] [--out feature_store]
+
+converts the CSVs once into Parquet:
+  <store>/rank_pairs/       hive-partitioned by victim_state (and month,
+                            when the pairs carry complaint_timestamp)
+  <store>/atm_master/       one Parquet file
+
+Categorical columns are dictionary-encoded on disk and come back as
+dictionary arrays (pandas Categorical), so repeated strings are never
+materialized per row. Readers select columns and may pass a
+partition_filter() - train_ranker.py / tune_ranker.py --states and
+--months - which prunes whole partition directories before anything is
+read. Files are read memory-mapped.
+
+iter_chunks() / read_frame() / columns_of() / signature() accept either a
+CSV path or a store dataset directory, so train_ranker.py, pair_cache.py
+and backend/seed.py read whichever exists without caring which.
+
+pyarrow is optional: without it, CSV sources keep working and building
+or reading the store raises ImportError.
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pa_fs
+except ImportError:  # optional dependency
+    pa = None
+
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "feature_store")
+RANK_PAIRS = "rank_pairs"
+ATM_MASTER = "atm_master"
+MANIFEST = "_manifest.json"   # "_" prefix: ignored by dataset discovery
+
+# String columns stored dictionary-encoded
+CATEGORICAL_COLS = [
+    "victim_state",
+    "victim_district",
+    "victim_taluka",
+    "victim_village",
+    "victim_rural_urban",
+    "channel",
+    "fraud_type",
+    "device_type",
+    "linked_fraud_ring",
+    "bank_name",
+    "suspected_atm_name",
+    "suspected_atm_place",
+    "atm_bank_name",
+]
+# Read as strings even when they look numeric
+STRING_COLS = CATEGORICAL_COLS + ["complaint_id"]
+
+PARTITION_STATE = "victim_state"
+PARTITION_MONTH = "month"
+TIMESTAMP_COL = "complaint_timestamp"
+ROWS_PER_GROUP = 64 * 1024
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("The feature store needs pyarrow (pip install pyarrow)")
+
+
+def dataset_path(name, store_dir=FEATURE_STORE_DIR):
+    return os.path.join(store_dir, name)
+
+
+def is_store(path):
+    """True for a dataset directory written by build_dataset()."""
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def load_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def signature(path):
+    """Changes whenever the source is rebuilt/rewritten (cache keys, seed checkpoints)."""
+    if is_store(path):
+        manifest = load_manifest(path)
+        return f"{os.path.abspath(path)}:{manifest['built_at']}:{manifest['rows']}"
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+# ----------------------------------------------------------------------
+# Build
+# ----------------------------------------------------------------------
+
+def _csv_batches(csv_path, block_size):
+    header = pd.read_csv(csv_path, nrows=0).columns
+    convert = pa_csv.ConvertOptions(column_types={c: pa.string() for c in STRING_COLS if c in header})
+    reader = pa_csv.open_csv(csv_path, read_options=pa_csv.ReadOptions(block_size=block_size),
+                             convert_options=convert)
+    return reader.schema, reader
+
+
+def _with_month(batch):
+    """Add the `month` partition column (YYYY-MM) derived from complaint_timestamp."""
+    ts = batch.column(TIMESTAMP_COL)
+    if pa.types.is_timestamp(ts.type):
+        month = pc.strftime(ts, format="%Y-%m")
+    else:
+        month = pc.utf8_slice_codeunits(pc.cast(ts, pa.string()), 0, 7)
+    return pa.RecordBatch.from_arrays(batch.columns + [month], names=batch.schema.names + [PARTITION_MONTH])
+
+
+def build_dataset(csv_path, out_dir, partition_cols=(), block_size=16 << 20):
+    """
+    Stream `csv_path` into a Parquet dataset at `out_dir` (replaced
+    atomically). Returns the row count.
+    """
+    require_pyarrow()
+    started = time.perf_counter()
+    schema, reader = _csv_batches(csv_path, block_size)
+
+    add_month = PARTITION_MONTH in partition_cols and TIMESTAMP_COL in schema.names
+    partition_cols = [c for c in partition_cols
+                      if c in schema.names or (c == PARTITION_MONTH and add_month)]
+    if add_month:
+        schema = schema.append(pa.field(PARTITION_MONTH, pa.string()))
+
+    rows = 0
+
+    def batches():
+        nonlocal rows
+        for batch in reader:
+            if add_month:
+                batch = _with_month(batch)
+            rows += batch.num_rows
+            yield batch
+
+    tmp = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    fmt = ds.ParquetFileFormat()
+    ds.write_dataset(
+        batches(), tmp, schema=schema, format=fmt,
+        partitioning=ds.partitioning(pa.schema([schema.field(c) for c in partition_cols]), flavor="hive")
+        if partition_cols else None,
+        # dictionary pages for the categoricals, stats for row-group pruning
+        file_options=fmt.make_write_options(
+            use_dictionary=[c for c in CATEGORICAL_COLS if c in schema.names],
+            write_statistics=True,
+            compression="zstd",
+        ),
+        max_rows_per_group=ROWS_PER_GROUP,
+        existing_data_behavior="overwrite_or_ignore",
+        # keep CSV row order so each complaint's pairs stay contiguous
+        use_threads=False,
+    )
+    with open(os.path.join(tmp, MANIFEST), "w") as f:
+        json.dump({
+            "source": os.path.abspath(csv_path),
+            "built_at": datetime.now().isoformat(),
+            "rows": rows,
+            "partitioning": partition_cols,
+            "columns": list(schema.names),
+        }, f, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+    print(f"[STORE] {csv_path} -> {out_dir}: {rows:,} rows in {time.perf_counter() - started:.1f}s")
+    return rows
+
+
+def build_store(pairs_csv=None, atms_csv=None, store_dir=FEATURE_STORE_DIR):
+    if pairs_csv:
+        build_dataset(pairs_csv, dataset_path(RANK_PAIRS, store_dir),
+                      partition_cols=(PARTITION_MONTH, PARTITION_STATE))
+    if atms_csv:
+        build_dataset(atms_csv, dataset_path(ATM_MASTER, store_dir))
+
+
+# ----------------------------------------------------------------------
+# Read
+# ----------------------------------------------------------------------
+
+def open_dataset(path):
+    """Memory-mapped dataset; categoricals and partition keys as dictionaries."""
+    require_pyarrow()
+    manifest = load_manifest(path)
+    fmt = ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(
+        dictionary_columns=[c for c in CATEGORICAL_COLS if c in manifest["columns"]],
+    ))
+    return ds.dataset(
+        os.path.abspath(path), format=fmt,
+        partitioning=ds.HivePartitioning.discover(infer_dictionary=True) if manifest["partitioning"] else None,
+        filesystem=pa_fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def partition_filter(states=None, months=None):
+    """Filter expression on the partition keys (prunes whole directories)."""
+    require_pyarrow()
+    expr = None
+    for field, values in ((PARTITION_STATE, states), (PARTITION_MONTH, months)):
+        if values:
+            term = ds.field(field).isin(list(values))
+            expr = term if expr is None else expr & term
+    return expr
+
+
+def source_filter(path, states=None, months=None):
+    """
+    partition_filter() for `path`, or None when no values are given.
+    Only a store dataset is partitioned: filtering a CSV is an error
+    rather than a silent full read.
+    """
+    if not states and not months:
+        return None
+    if not is_store(path):
+        raise ValueError(f"{path} is not a feature store dataset; "
+                         "build it with `python feature_store.py build` to filter by state/month")
+    return partition_filter(states, months)
+
+
+def _to_pandas(table):
+    # split_blocks + self_destruct: hand Arrow buffers to pandas without
+    # consolidating (and copying) columns into 2-D blocks
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def columns_of(path):
+    if is_store(path):
+        return list(load_manifest(path)["columns"])
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_frame(path, columns=None, filter=None, dtype=None):
+    """Whole source as one DataFrame, reading only `columns` (and `filter`ed rows for a store)."""
+    if is_store(path):
+        return _to_pandas(open_dataset(path).to_table(columns=columns, filter=filter))
+    return pd.read_csv(path, usecols=columns, dtype=dtype)
+
+
+def iter_chunks(path, chunk_rows, columns=None, filter=None, dtype=None, skip_rows=0):
+    """
+    DataFrames of about `chunk_rows` rows, in source order, skipping the
+    first `skip_rows` rows. `dtype` only applies to CSV sources (a store
+    is already typed).
+    """
+    if not is_store(path):
+        yield from pd.read_csv(path, chunksize=chunk_rows, usecols=columns, dtype=dtype,
+                               skiprows=range(1, skip_rows + 1) if skip_rows else None)
+        return
+
+    scanner = open_dataset(path).scanner(columns=columns, filter=filter, batch_size=chunk_rows,
+                                         use_threads=False)
+    pending, pending_rows = [], 0
+    for batch in scanner.to_batches():
+        if skip_rows:
+            if batch.num_rows <= skip_rows:
+                skip_rows -= batch.num_rows
+                continue
+            batch, skip_rows = batch.slice(skip_rows), 0
+        if batch.num_rows == 0:
+            continue
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= chunk_rows:
+            yield _to_pandas(pa.Table.from_batches(pending))
+            pending, pending_rows = [], 0
+    if pending:
+        yield _to_pandas(pa.Table.from_batches(pending))
+
+
+def resolve_source(csv_path, name, store_dir=FEATURE_STORE_DIR):
+    """The store dataset `name` if it has been built, else `csv_path`."""
+    path = dataset_path(name, store_dir)
+    if pa is not None and is_store(path):
+        return path
+    return csv_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the CIPHER columnar feature store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("--pairs", default="cipher_rank_pairs.csv")
+    build.add_argument("--atms", default="cipher_atm_master.csv")
+    build.add_argument("--out", default=FEATURE_STORE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build_store(
+            args.pairs if os.path.exists(args.pairs) else None,
+            args.atms if os.path.exists(args.atms) else None,
+            args.out,
+        )
+
+
+if __name__ == "__main__":
+    main()
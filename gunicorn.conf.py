@@ -0,0 +1,57 @@
+# Multi-process scoring: gunicorn + uvicorn workers, all cores, one copy
+# of the ATM master in RAM.
+#
+#   SCORING_SHARED_DIR=/dev/shm/cipher gunicorn backend.main:app -c gunicorn.conf.py
+#
+# The master loads only the ATM snapshot (plain numpy arrays, its BallTree
+# and distance coordinates) before forking; workers inherit those pages
+# copy-on-write. The LightGBM bundle is loaded in each worker after the
+# fork: LightGBM's OpenMP runtime is not fork-safe, so the master never
+# imports it. SCORING_SHARED_DIR additionally publishes the ATM arrays as
+# memory-mapped files, so snapshots rebuilt after a reseed share their raw
+# columns across workers too.
+#
+# Still built per worker: the model and its encoder tables (and any
+# hot-reloaded bundle), the snapshot's encoded ATM categoricals (keyed by
+# bundle version), and - once a reseed bumps the ATM version - the
+# BallTree and CoordTerms derived from the shared raw columns.
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# Each worker already scores on its own thread pool; keep the total
+# number of scoring threads at roughly one per core. Set before any worker
+# imports lightgbm, which sizes its OpenMP pool from OMP_NUM_THREADS.
+os.environ.setdefault("SCORING_WORKERS", "1")
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+
+def on_starting(server):
+    from backend.atm_snapshot import atm_snapshots
+
+    try:
+        atm_snapshots.get()
+    except Exception as e:
+        server.log.warning(f"Could not preload ATM snapshot: {e}")
+
+    # Move everything loaded so far out of the GC's reach, so collections in
+    # the workers don't touch (and un-share) these pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from backend.database import engine
+    from backend.history_database import engine_history
+    from backend.model_registry import model_registry
+
+    # Connections opened by the master must not be shared across processes
+    engine.dispose(close=False)
+    engine_history.dispose(close=False)
+
+    # First lightgbm import in this process: its OpenMP threads start here
+    model_registry.load()
@@ -0,0 +1,291 @@
+"""
+Columnar on-disk cache of encoded training pairs for out-of-core training
+(train_ranker.py --out-of-core).
+
+The pairs source (CSV, or the feature_store.py rank_pairs dataset) is
+streamed twice, chunk by chunk:
+  1. collect the vocabulary of every categorical column (-> LabelEncoders)
+  2. encode each chunk into a float64 feature block and write it as .npy
+     parts under <cache>/train and <cache>/test
+
+Chunks are cut on complaint boundaries, so no query group spans two parts
+(the CSV must keep each complaint's rows contiguous, as LightGBM requires
+anyway). The train/test split hashes complaint_id, so it needs no global
+list of ids. Peak memory is one chunk plus the per-row label/group arrays,
+whatever the size of the CSV.
+
+The cache is reused while the source file (path, size, mtime) and the
+encoding settings are unchanged. The train part is also saved once as a
+LightGBM binary Dataset, so later retrains skip binning as well.
+"""
+import json
+import os
+import pickle
+import shutil
+import time
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+import feature_store
+from distance import pairwise_distance_km
+
+CACHE_FORMAT = 1
+SPLITS = ("train", "test")
+COORD_COLS = ("victim_lat", "victim_lon", "atm_lat", "atm_lon")
+DISTANCE_COL = "victim_atm_distance_km"
+TRAIN_BINARY = "train.bin"
+# Resolution of the hashed train/test split
+SPLIT_BUCKETS = 10000
+# Class a missing categorical value is encoded as
+MISSING_CLASS = "nan"
+
+
+def source_signature(path):
+    return feature_store.signature(path)
+
+
+def category_strings(series):
+    """
+    Categorical column as the encoders see it: str values, missing ->
+    MISSING_CLASS. Explicit because astype(str) keeps NaN under pandas 3;
+    train_ranker.py's in-memory path encodes through this too.
+    """
+    return series.astype(object).where(series.notna(), MISSING_CLASS).astype(str)
+
+
+def _string_values(series):
+    """Distinct values as category_strings() yields them."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = set(series.cat.categories.astype(str))
+        if series.isna().any():
+            values.add(MISSING_CLASS)
+        return values
+    return set(category_strings(series).unique())
+
+
+def _encode_strings(series, classes):
+    """LabelEncoder codes; Categorical columns are mapped once per category."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        category_codes = np.searchsorted(classes, series.cat.categories.astype(str).to_numpy())
+        codes = series.cat.codes.to_numpy()
+        out = category_codes[codes] if len(category_codes) else np.zeros(len(codes), dtype=np.intp)
+        if (codes < 0).any():
+            out = np.where(codes < 0, np.searchsorted(classes, MISSING_CLASS), out)
+        return out
+    return np.searchsorted(classes, category_strings(series).to_numpy(dtype=object))
+
+
+def _run_lengths(ids):
+    """Sizes of consecutive runs of equal ids (= LightGBM query groups)."""
+    if len(ids) == 0:
+        return np.zeros(0, dtype=np.int32)
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    return np.diff(np.r_[starts, len(ids)]).astype(np.int32)
+
+
+def iter_group_chunks(path, chunk_rows, group_col, usecols=None, dtype=None, filter=None):
+    """
+    Yield chunks of about `chunk_rows` rows (CSV or feature store) that
+    never split a run of rows sharing the same `group_col` value.
+    """
+    carry = None
+    for chunk in feature_store.iter_chunks(path, chunk_rows, columns=usecols, dtype=dtype, filter=filter):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        ids = chunk[group_col].to_numpy()
+        # hold back the trailing group: it may continue in the next chunk
+        cut = len(ids) - int(_run_lengths(ids)[-1]) if len(ids) else 0
+        if cut == 0:
+            carry = chunk
+            continue
+        carry = chunk.iloc[cut:]
+        yield chunk.iloc[:cut]
+    if carry is not None and len(carry):
+        yield carry
+
+
+def scan_vocabulary(path, categorical_cols, chunk_rows, filter=None):
+    """Pass 1: LabelEncoders fitted on every value seen in the CSV."""
+    vocab = {col: set() for col in categorical_cols}
+    reader = feature_store.iter_chunks(path, chunk_rows, columns=list(categorical_cols),
+                                       dtype={c: str for c in categorical_cols}, filter=filter)
+    for chunk in reader:
+        for col in categorical_cols:
+            vocab[col].update(_string_values(chunk[col]))
+
+    encoders = {}
+    for col in categorical_cols:
+        le = LabelEncoder()
+        le.fit(np.array(sorted(vocab[col])))
+        encoders[col] = le
+        print(f"[ENCODE] {col} -> {len(le.classes_)} classes")
+    return encoders
+
+
+def test_mask(ids, test_size):
+    """Deterministic group split: a complaint is in test iff its id hashes low."""
+    buckets = pd.util.hash_array(np.asarray(ids, dtype=object)) % SPLIT_BUCKETS
+    return buckets < int(round(test_size * SPLIT_BUCKETS))
+
+
+def encode_chunk(chunk, feature_cols, encoders, distance_method):
+    """Feature block in `feature_cols` order, encoded like the in-memory path."""
+    if DISTANCE_COL in feature_cols and set(COORD_COLS).issubset(chunk.columns):
+        lat1, lon1, lat2, lon2 = (pd.to_numeric(chunk[c], errors="coerce").to_numpy(dtype=float)
+                                  for c in COORD_COLS)
+        chunk = chunk.assign(**{DISTANCE_COL: pairwise_distance_km(lat1, lon1, lat2, lon2,
+                                                                   method=distance_method)})
+
+    X = np.empty((len(chunk), len(feature_cols)), dtype=np.float64)
+    for j, col in enumerate(feature_cols):
+        if col in encoders:
+            X[:, j] = _encode_strings(chunk[col], encoders[col].classes_)
+        else:
+            X[:, j] = pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64)
+    return X
+
+
+def load_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "manifest.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def cache_is_current(manifest, source, options):
+    return (
+        manifest is not None
+        and manifest.get("format") == CACHE_FORMAT
+        and manifest.get("source") == source
+        and manifest.get("options") == options
+    )
+
+
+def cache_options(distance_method, test_size, states=None, months=None):
+    """Settings the cache content depends on (any change rebuilds it)."""
+    return {
+        "distance_method": distance_method,
+        "test_size": test_size,
+        "states": sorted(states) if states else None,
+        "months": sorted(months) if months else None,
+    }
+
+
+def build_cache(path, cache_dir, feature_cols, categorical_cols, label_col, group_col,
+                distance_method, test_size, chunk_rows, states=None, months=None):
+    """
+    Two streaming passes over `path`, restricted to the `states` / `months`
+    partitions of a store dataset when given; returns the manifest.
+    """
+    started = time.perf_counter()
+    source = source_signature(path)
+    options = cache_options(distance_method, test_size, states, months)
+    filter = feature_store.source_filter(path, states, months)
+
+    print(f"[CACHE] Pass 1/2: scanning categorical vocabularies in {path} ...")
+    encoders = scan_vocabulary(path, categorical_cols, chunk_rows, filter)
+
+    tmp = f"{cache_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    for split in SPLITS:
+        os.makedirs(os.path.join(tmp, split))
+
+    print("[CACHE] Pass 2/2: encoding pairs ...")
+    header = feature_store.columns_of(path)
+    usecols = [c for c in header if c in set(feature_cols) | {label_col, group_col} | set(COORD_COLS)]
+    parts = {split: [] for split in SPLITS}
+    rows = {split: 0 for split in SPLITS}
+    dtype = {c: str for c in list(categorical_cols) + [group_col]}
+    for n, chunk in enumerate(iter_group_chunks(path, chunk_rows, group_col, usecols, dtype, filter)):
+        X = encode_chunk(chunk, feature_cols, encoders, distance_method)
+        y = pd.to_numeric(chunk[label_col]).to_numpy(dtype=np.float32)
+        ids = chunk[group_col].to_numpy()
+        in_test = test_mask(ids, test_size)
+        for split, mask in (("train", ~in_test), ("test", in_test)):
+            if not mask.any():
+                continue
+            name = f"part-{n:05d}"
+            base = os.path.join(tmp, split, name)
+            np.save(f"{base}.X.npy", X[mask])
+            np.save(f"{base}.y.npy", y[mask])
+            np.save(f"{base}.group.npy", _run_lengths(ids[mask]))
+            parts[split].append(name)
+            rows[split] += int(mask.sum())
+        print(f"[CACHE] chunk {n}: train rows {rows['train']:,}, test rows {rows['test']:,}")
+
+    with open(os.path.join(tmp, "encoders.pkl"), "wb") as f:
+        pickle.dump(encoders, f)
+    manifest = {
+        "format": CACHE_FORMAT,
+        "source": source,
+        "options": options,
+        "feature_cols": list(feature_cols),
+        "categorical_cols": list(categorical_cols),
+        "parts": parts,
+        "rows": rows,
+    }
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp, cache_dir)
+    print(f"[CACHE] Built {cache_dir} in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+
+def load_encoders(cache_dir):
+    with open(os.path.join(cache_dir, "encoders.pkl"), "rb") as f:
+        return pickle.load(f)
+
+
+class PartSequence(lgb.Sequence):
+    """One memory-mapped feature part, read by LightGBM in batches."""
+
+    def __init__(self, path, batch_size):
+        self.data = np.load(path, mmap_mode="r")
+        self.batch_size = batch_size
+
+    def __getitem__(self, idx):
+        return self.data[idx]
+
+    def __len__(self):
+        return len(self.data)
+
+
+def _part_paths(cache_dir, manifest, split):
+    return [os.path.join(cache_dir, split, name) for name in manifest["parts"][split]]
+
+
+def train_dataset(cache_dir, manifest, batch_size, params=None):
+    """
+    LightGBM Dataset for the train split: the saved binary if present,
+    otherwise built from the .npy parts and then saved as binary.
+    """
+    binary = os.path.join(cache_dir, TRAIN_BINARY)
+    if os.path.exists(binary):
+        print(f"[CACHE] Reusing binary Dataset {binary}")
+        return lgb.Dataset(binary, params=params)
+
+    bases = _part_paths(cache_dir, manifest, "train")
+    dataset = lgb.Dataset(
+        [PartSequence(f"{b}.X.npy", batch_size) for b in bases],
+        label=np.concatenate([np.load(f"{b}.y.npy") for b in bases]),
+        group=np.concatenate([np.load(f"{b}.group.npy") for b in bases]),
+        feature_name=[c.replace(" ", "_") for c in manifest["feature_cols"]],
+        params=params,
+        free_raw_data=True,
+    )
+    dataset.construct()
+    dataset.save_binary(binary)
+    print(f"[CACHE] Saved binary Dataset {binary}")
+    return dataset
+
+
+def iter_split(cache_dir, manifest, split):
+    """(X, y) per part of `split`, memory-mapped."""
+    for base in _part_paths(cache_dir, manifest, split):
+        yield np.load(f"{base}.X.npy", mmap_mode="r"), np.load(f"{base}.y.npy")
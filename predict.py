@@ -1,36 +1,237 @@
+import json
+import logging
 import pandas as pd
 import numpy as np
-import pickle
 from datetime import datetime
 
-BUNDLE_PATH = "cipher_ranker_bundle.pkl"
+from backend.config import settings
+from backend.metrics import metrics, SCORED_COMPLAINTS, SCORED_PAIRS
+from backend.model_registry import model_registry
+from distance import LEGACY_METHOD, victim_atm_distance_km
+
+logger = logging.getLogger(__name__)
+
 ATM_MASTER_PATH = "cipher_atm_master.csv"
 
+# Rank-based risk bands: (risk_class, last_rank, score_low, score_high).
+# Ranks inside a band are spread linearly from score_high (first rank)
+# down towards score_low. Ranks past the last band get RISK_FALLBACK.
+#   Very Critical: 0.9 - 1.0 (Top 1-5)
+#   Critical:      0.8 - 0.9 (Top 6-10)
+#   High:          0.7 - 0.8 (Top 11-15)
+#   Medium:        0.6 - 0.7 (Top 16-20)
+#   Low:           0.5 - 0.6 (Top 21-25)
+RISK_BANDS = (
+    ("Very Critical", 5, 0.90, 0.99),
+    ("Critical", 10, 0.80, 0.89),
+    ("High", 15, 0.70, 0.79),
+    ("Medium", 20, 0.60, 0.69),
+    ("Low", 25, 0.50, 0.59),
+)
+# Fallback for > 25 (Low/Safe)
+RISK_FALLBACK = ("Low", 0.4)
+
+
+# ATM-side categorical features -> snapshot column holding the raw value
+ATM_CATEGORICAL_SOURCES = {
+    "suspected_atm_name": "atm_name",
+    "suspected_atm_place": "atm_place",
+    "atm_bank_name": "atm_bank_name",
+}
+
+
+def load_risk_bands(path):
+    """
+    Read a banding table from JSON:
+    {"bands": [[risk_class, last_rank, score_low, score_high], ...],
+     "fallback": [risk_class, score]}
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+    bands = tuple(
+        (str(name), int(last), float(lo), float(hi)) for name, last, lo, hi in cfg["bands"]
+    )
+    bands = tuple(sorted(bands, key=lambda b: b[1]))
+    name, score = cfg.get("fallback", RISK_FALLBACK)
+    return bands, (str(name), float(score))
+
+
+if settings.RISK_BANDS_PATH:
+    RISK_BANDS, RISK_FALLBACK = load_risk_bands(settings.RISK_BANDS_PATH)
+
 
-def encode_with_encoder(colname: str, series, encoders: dict):
+def classify_ranks(rank_order, bands=None, fallback=None):
+    """
+    Map 1-based ranks to (risk_class, risk_score_norm) arrays using the
+    banding table - one searchsorted over all rows instead of a Python
+    callback per row.
+    """
+    bands = RISK_BANDS if bands is None else bands
+    fallback = RISK_FALLBACK if fallback is None else fallback
+    ranks = np.asarray(rank_order, dtype=np.int64)
+
+    last = np.array([b[1] for b in bands], dtype=np.int64)
+    first = np.concatenate(([1], last[:-1] + 1))
+    # One extra slot at the end for the fallback band (flat score)
+    width = np.append(last - first + 1, 1).astype(np.float64)
+    last = np.append(last, 0)
+    classes = np.array([b[0] for b in bands] + [fallback[0]], dtype=object)
+    low = np.array([b[2] for b in bands] + [fallback[1]], dtype=np.float64)
+    high = np.array([b[3] for b in bands] + [fallback[1]], dtype=np.float64)
+
+    band = np.searchsorted(last[:-1], ranks, side="left")
+    frac = (last[band] + 1 - ranks) / width[band]
+    scores = low[band] + frac * (high[band] - low[band])
+    return classes[band], scores
+
+
+def encode_scalar(table, value):
     """
-    Encode using the same LabelEncoder from training.
+    Encode one value with a precompiled encoder table (see
+    backend.model_registry.compile_encoder_tables).
     Handles unknown categories by mapping to 0.
     """
-    import pandas as pd
+    return table.get(str(value), 0)
 
-    if colname not in encoders:
-        return series
 
-    if isinstance(series, pd.DataFrame):
-        series = series.iloc[:, 0]
+def encode_array(table, values):
+    """Vectorized encode_scalar over an array of raw values."""
+    codes = pd.Series(values, copy=False).astype(str).map(table)
+    return codes.fillna(0).to_numpy(dtype=np.int64)
 
-    le = encoders[colname]
-    classes = list(le.classes_)
-    mapping = {cls: idx for idx, cls in enumerate(classes)}
 
-    encoded = series.astype(str).map(mapping)
-    encoded = encoded.fillna(0).astype(int)
+def encode_atm_categoricals(snapshot, bundle):
+    """
+    Encoded ATM-side categoricals for this snapshot and bundle.
+    Computed once per (snapshot, bundle version) and cached on the snapshot.
+    """
+    from backend.atm_snapshot import read_only
+
+    key = bundle["version"]
+    encoded = snapshot.encoded.get(key)
+    if encoded is None:
+        encoded = {}
+        tables = bundle["encoder_tables"]
+        with metrics.stage("encode"):
+            for col in bundle["categorical_cols"]:
+                src = ATM_CATEGORICAL_SOURCES.get(col)
+                if col in tables and src in snapshot.arrays:
+                    encoded[col] = read_only(encode_array(tables[col], snapshot.arrays[src]))
+        # Only the live bundle's encodings are worth keeping
+        snapshot.encoded = {key: encoded}
     return encoded
 
 
-def predict_atm_risk(complaint: dict):
-    # -------- 0. Handle / normalize complaint timestamp ----------
+def _as_float(value):
+    """Complaint scalar -> float; None/blank/non-numeric become NaN."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def build_feature_matrix(complaint: dict, snapshot, bundle, rows=None, dtype=np.float64, out=None):
+    """
+    Assemble the model input for one complaint against the snapshot ATMs
+    (all of them, or only `rows`), written straight into a preallocated
+    (n_atm x F) matrix in bundle["feature_cols"] order. ATM columns are
+    copied from the snapshot (categoricals pre-encoded), complaint values
+    are broadcast, and features neither side provides are filled with 0.
+    Pass `out` to fill a slice of a larger (batch) matrix instead.
+    """
+    feature_cols = bundle["feature_cols"]
+    encoder_tables = bundle["encoder_tables"]
+    atm_encoded = encode_atm_categoricals(snapshot, bundle)
+    atm = snapshot.arrays
+
+    def take(arr):
+        return arr if rows is None else arr[rows]
+
+    n_rows = len(snapshot) if rows is None else len(rows)
+    X = np.empty((n_rows, len(feature_cols)), dtype=dtype) if out is None else out
+    missing_cols = []
+    for j, col in enumerate(feature_cols):
+        if col in atm_encoded:
+            X[:, j] = take(atm_encoded[col])
+        elif col in ATM_CATEGORICAL_SOURCES:
+            # ATM-side feature the atms table does not carry
+            X[:, j] = 0.0
+            missing_cols.append(col)
+        elif col in atm:
+            X[:, j] = take(atm[col])
+        elif col in complaint:
+            if col in encoder_tables:
+                X[:, j] = encode_scalar(encoder_tables[col], complaint[col])
+            else:
+                X[:, j] = _as_float(complaint[col])
+        elif col == "victim_atm_distance_km":
+            if "victim_lat" in complaint and "victim_lon" in complaint:
+                # same kernel + method the bundle was trained with
+                X[:, j] = victim_atm_distance_km(
+                    _as_float(complaint["victim_lat"]),
+                    _as_float(complaint["victim_lon"]),
+                    snapshot.coords(settings.DISTANCE_DTYPE),
+                    method=bundle.get("distance_method", LEGACY_METHOD),
+                    rows=rows,
+                )
+            else:
+                X[:, j] = 0.0
+        else:
+            X[:, j] = 0.0
+            missing_cols.append(col)
+
+    if missing_cols:
+        _warn_missing(bundle, missing_cols)
+    return X
+
+
+# (bundle version, missing columns) already reported at WARNING level
+_missing_reported = set()
+
+
+def _warn_missing(bundle, missing_cols):
+    """Missing features are a property of the bundle: warn once, then only at DEBUG."""
+    key = (bundle.get("version"), tuple(missing_cols))
+    level = logging.DEBUG if key in _missing_reported else logging.WARNING
+    _missing_reported.add(key)
+    logger.log(level, "The following %d features are MISSING from data, filled with 0.0: %s",
+               len(missing_cols), missing_cols)
+
+
+def candidate_rows(complaint: dict, snapshot, top_k=None):
+    """
+    Snapshot rows worth scoring for this complaint, or None for "all ATMs".
+
+    Far-away ATMs practically never reach the top K (victim_atm_distance_km
+    is a model feature), so top-K requests only score ATMs near the victim,
+    widening the radius when too few are found. Full rankings and
+    complaints without usable coordinates score everything.
+    """
+    if top_k is None or settings.CANDIDATE_RADIUS_KM <= 0:
+        return None
+    lat = _as_float(complaint.get("victim_lat"))
+    lon = _as_float(complaint.get("victim_lon"))
+    if not (np.isfinite(lat) and np.isfinite(lon)):
+        return None
+
+    min_count = max(settings.CANDIDATE_MIN_COUNT, top_k)
+    if min_count >= len(snapshot):
+        return None
+    max_count = max(settings.CANDIDATE_MAX_COUNT, top_k) if settings.CANDIDATE_MAX_COUNT > 0 else 0
+
+    rows = snapshot.geo_index.candidates(
+        lat,
+        lon,
+        radius_km=settings.CANDIDATE_RADIUS_KM,
+        min_candidates=min_count,
+        max_radius_km=max(settings.CANDIDATE_MAX_RADIUS_KM, settings.CANDIDATE_RADIUS_KM),
+        max_candidates=max_count,
+    )
+    return rows if len(rows) else None
+
+
+def timestamp_display(complaint: dict) -> str:
+    """Normalize the complaint timestamp into the display string used in results."""
     # allow complaint_timestamp in dict, else use "now"
     ts_str = complaint.get("complaint_timestamp")
     if ts_str is None:
@@ -43,196 +244,191 @@ def predict_atm_risk(complaint: dict):
             ts = ts_str  # keep as string
     # also store a nice display string
     if isinstance(ts, (pd.Timestamp, datetime)):
-        ts_display = ts.strftime("%d-%b-%Y %H:%M")
-    else:
-        ts_display = str(ts)
-
-    # --- Load ATM master from DB ---
-    print(f"[LOAD] ATM master from PostgreSQL ...")
-    from backend.database import engine
-    from backend.models import ATM
-    
-    # Read entire ATM table
-    # Columns in DB match CSV structure: suspected_atm_lat, suspected_atm_lon, etc.
-    atm_df = pd.read_sql("SELECT * FROM atms", engine)
-    print("[INFO] ATM count:", len(atm_df))
-
-    # Rename columns to match what the model and logic expects
-    atm_df = atm_df.rename(columns={
-        "suspected_atm_index": "atm_id",
-        "suspected_atm_lat": "atm_lat",
-        "suspected_atm_lon": "atm_lon",
-        "suspected_atm_name": "atm_name",
-        "suspected_atm_place": "atm_place"
-    })
-    
-    # Cast to correct types to avoid 'object' dtype (Decimal)
-    atm_df["atm_id"] = pd.to_numeric(atm_df["atm_id"], errors='coerce').fillna(0).astype(int)
-    atm_df["atm_lat"] = pd.to_numeric(atm_df["atm_lat"], errors='coerce').astype(float)
-    atm_df["atm_lon"] = pd.to_numeric(atm_df["atm_lon"], errors='coerce').astype(float)
-    atm_df["atm_total_complaints"] = pd.to_numeric(atm_df["atm_total_complaints"], errors='coerce').fillna(0).astype(int)
-    atm_df["atm_avg_loss"] = pd.to_numeric(atm_df["atm_avg_loss"], errors='coerce').astype(float)
-
-    # Nice display columns (kept separate from encoded cols)
-    atm_df["atm_name_display"] = atm_df["atm_name"]
-    atm_df["atm_place_display"] = atm_df["atm_place"]
-
-    # --- Load model bundle ---
-    print(f"[LOAD] Bundle from {BUNDLE_PATH} ...")
-    with open(BUNDLE_PATH, "rb") as f:
-        bundle = pickle.load(f)
+        return ts.strftime("%d-%b-%Y %H:%M")
+    return str(ts)
 
-    model = bundle["model"]
-    feature_cols = bundle["feature_cols"]
-    categorical_cols = bundle["categorical_cols"]
-    encoders = bundle["encoders"]
 
-    # --- Build full candidate set: one row per ATM for this complaint ---
-    n_atm = len(atm_df)
-    comp_df = pd.DataFrame([complaint] * n_atm)
+def select_top_k(scores, top_k=None):
+    """
+    Row indices ordered by descending score. With top_k, only the K best
+    are selected (argpartition, O(n)) and sorted; otherwise every row is.
+    """
+    n = len(scores)
+    if top_k is None or top_k >= n:
+        return np.argsort(-scores, kind="stable")
+    if top_k <= 0:
+        return np.empty(0, dtype=np.intp)
+    best = np.argpartition(-scores, top_k - 1)[:top_k]
+    return best[np.argsort(-scores[best], kind="stable")]
 
-    # attach normalized timestamp fields if you want later
-    comp_df["complaint_timestamp"] = ts_display
 
-    full_df = pd.concat(
-        [comp_df.reset_index(drop=True), atm_df.reset_index(drop=True)],
-        axis=1
+def ranking_frame(complaint: dict, snapshot, rows, scores, ts_display=None):
+    """
+    Materialize the result rows for `rows` (snapshot indices, best first)
+    with their raw `scores`: ATM details, rank-based class/score and the
+    complaint text. Only the selected rows are ever touched.
+    """
+    if ts_display is None:
+        ts_display = timestamp_display(complaint)
+
+    atm = snapshot.arrays
+    rank_order = np.arange(1, len(rows) + 1)  # 1,2,3,...
+    # Hybrid Approach: Classify by Rank, then Assign Score within Range
+    # This ensures the Top 25 list shows a diversity of Risk Levels as per user requirement.
+    risk_class, risk_score_norm = classify_ranks(rank_order)
+
+    # --- Build complaint_text including timestamp (for UI alerts) ---
+    # (same text repeated for each row; frontend can just use the first row)
+    complaint_text = (
+        f"Complaint received on {ts_display}"
+        f" from {complaint.get('victim_village')}, {complaint.get('victim_taluka')},"
+        f" {complaint.get('victim_district')}. Fraud type: {complaint.get('fraud_type')},"
+        f" Bank: {complaint.get('bank_name')}."
     )
 
-    # --- Compute victim_atm_distance_km if not already there ---
-    if "victim_atm_distance_km" not in full_df.columns:
-        if (
-            "victim_lat" in full_df.columns
-            and "victim_lon" in full_df.columns
-            and "atm_lat" in full_df.columns
-            and "atm_lon" in full_df.columns
-        ):
-            # rough Euclidean distance in km
-            full_df["victim_atm_distance_km"] = np.sqrt(
-                (full_df["victim_lat"].astype(float) - full_df["atm_lat"].astype(float)) ** 2
-                + (full_df["victim_lon"].astype(float) - full_df["atm_lon"].astype(float)) ** 2
-            ) * 111.0
-        else:
-            full_df["victim_atm_distance_km"] = 0.0
-
-    # --- Encode categorical columns exactly as in training ---
-    for col in categorical_cols:
-        if col in full_df.columns:
-            full_df[col] = encode_with_encoder(col, full_df[col], encoders)
-
-    # --- Select features in correct order ---
-    used_feature_cols = [c for c in feature_cols if c in full_df.columns]
-    print("[INFO] Using", len(used_feature_cols), "features at prediction:")
-    
-    missing_cols = set(feature_cols) - set(full_df.columns)
-    if missing_cols:
-        print(f"[WARNING] The following {len(missing_cols)} features are MISSING from data: {missing_cols}")
-        # Add them as 0 to avoid crash?
-        for c in missing_cols:
-             full_df[c] = 0.0
-        print("[INFO] Filled missing features with 0.0")
-        
-        # Re-select to include filled ones
-        used_feature_cols = [c for c in feature_cols if c in full_df.columns]
+    return pd.DataFrame({
+        "atm_id": atm["atm_id"][rows],
+        "atm_name_display": atm["atm_name_display"][rows],
+        "atm_place_display": atm["atm_place_display"][rows],
+        "atm_lat": atm["atm_lat"][rows],
+        "atm_lon": atm["atm_lon"][rows],
+        "risk_score_raw": np.array(scores, dtype=np.float64),
+        "risk_score_norm": risk_score_norm,
+        "risk_class": risk_class,
+        "atm_total_complaints": atm["atm_total_complaints"][rows],
+        "atm_avg_loss": atm["atm_avg_loss"][rows],
+        "rank_order": rank_order,
+        "complaint_timestamp": ts_display,
+        "complaint_text": complaint_text,
+    })
+
+
+def predict_atm_risk(complaint: dict, top_k=None):
+    """
+    Score every ATM for one complaint and return the ranked result frame.
+    With top_k, only the K highest-risk ATMs are selected and materialized;
+    top_k=None returns the full ranking (analyst mode).
+    """
+    return predict_atm_risk_batch([complaint], top_k=top_k)[0]
 
-    X = full_df[used_feature_cols]
+
+def _cache_key(complaint: dict, snapshot, bundle, top_k):
+    from backend.prediction_cache import complaint_fingerprint
+
+    # complaint-side model inputs, plus coordinates (distance + pruning)
+    fields = set(bundle["feature_cols"]) | {"victim_lat", "victim_lon"}
+    fingerprint = complaint_fingerprint(complaint, fields)
+    return f"{bundle['version']}:{snapshot.version}:{top_k}:{fingerprint}"
+
+
+def _score_chunk(complaints, snapshot, bundle, top_k):
+    """One stacked feature matrix and model call for `complaints`."""
+    model = bundle["model"]
+
+    # --- Spatial pruning: only plausible ATMs reach the model ---
+    with metrics.stage("candidates"):
+        candidates = [candidate_rows(c, snapshot, top_k) for c in complaints]
+    sizes = [len(snapshot) if rows is None else len(rows) for rows in candidates]
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+
+    # --- Build the stacked feature matrix directly in model order ---
+    with metrics.stage("features"):
+        X = np.empty((int(offsets[-1]), len(bundle["feature_cols"])), dtype=np.float64)
+        for i, (complaint, rows) in enumerate(zip(complaints, candidates)):
+            build_feature_matrix(complaint, snapshot, bundle, rows, out=X[offsets[i]:offsets[i + 1]])
 
     # --- Predict raw scores ---
-    print("[PREDICT] Scoring ATMs ...")
-    raw_scores = model.predict(X)
-    full_df["risk_score_raw"] = raw_scores
+    logger.debug("Scoring %d complaint-ATM pairs for %d complaint(s)", len(X), len(complaints))
+    with metrics.stage("predict"):
+        raw_scores = np.asarray(model.predict(X), dtype=np.float64)
+    SCORED_PAIRS.inc(amount=len(X))
+
+    # --- Per complaint: highest risk first ---
+    ranked = []
+    with metrics.stage("select"):
+        for i, rows in enumerate(candidates):
+            scores = raw_scores[offsets[i]:offsets[i + 1]]
+            order = select_top_k(scores, top_k)
+            atm_rows = order if rows is None else rows[order]
+            ranked.append((atm_rows, scores[order]))
+    return ranked
+
+
+def _score_complaints(complaints, snapshot, bundle, top_k):
+    """
+    Score complaints in stacked model calls of at most
+    SCORING_CHUNK_COMPLAINTS complaints each, so the feature matrix of a
+    large (or full-ranking) batch stays bounded.
+    Returns (atm_rows, scores) per complaint: snapshot row indices best
+    first, with their raw scores.
+    """
+    chunk = max(1, settings.SCORING_CHUNK_COMPLAINTS)
+    ranked = []
+    for start in range(0, len(complaints), chunk):
+        ranked.extend(_score_chunk(complaints[start:start + chunk], snapshot, bundle, top_k))
+    return ranked
 
-    # --- Normalize scores (0–1) for display ---
-    s = full_df["risk_score_raw"].astype(float)
-    s_min, s_max = float(s.min()), float(s.max())
-    denom = (s_max - s_min) if s_max > s_min else 1.0
-    full_df["risk_score_norm"] = (s - s_min) / denom
 
-    # --- Sort by highest risk & assign rank-based risk classes ---
-    full_df = full_df.sort_values("risk_score_raw", ascending=False).reset_index(drop=True)
-    full_df["rank_order"] = full_df.index + 1  # 1,2,3,...
+def rank_complaints(complaints, snapshot, bundle, top_k=None, cache=None):
+    """
+    Ranked result frames for `complaints` against a given ATM snapshot and
+    bundle. With a `cache` (the prediction cache), rankings already cached
+    for the same model inputs, bundle and snapshot skip scoring; only the
+    misses are scored, in one stacked model call.
+    """
+    from backend.atm_snapshot import read_only
 
-    # Hybrid Approach: Classify by Rank, then Assign Score within Range
-    # This ensures the Top 25 list shows a diversity of Risk Levels as per user requirement.
-    def classify_and_score(row):
-        r = row["rank_order"]
-        # Ranges:
-        # Very Critical: 0.9 - 1.0 (Top 1-5)
-        # Critical:      0.8 - 0.9 (Top 6-10)
-        # High:          0.7 - 0.8 (Top 11-15)
-        # Medium:        0.6 - 0.7 (Top 16-20)
-        # Low:           0.5 - 0.6 (Top 21-25)
-        
-        if r <= 5:
-            # Map 1-5 linearly to 0.99 - 0.91
-            # 1 -> 0.99, 5 -> 0.91
-            # score = 1.01 - (r * 0.02)
-            score = 1.0 - (r / 50.0) # 1->0.98, 5->0.90
-            # Let's use simple interpolation for cleaner code if needed, but this is fine.
-            # 0.9 + (5-r+1)*0.018 roughly
-            val = 0.9 + ((6-r)/5.0)*0.09 
-            return "Very Critical", min(val, 0.99)
-        elif r <= 10:
-            # 0.8 - 0.9
-            # 6->0.89, 10->0.81
-            val = 0.8 + ((11-r)/5.0)*0.09
-            return "Critical", val
-        elif r <= 15:
-            # 0.7 - 0.8
-            val = 0.7 + ((16-r)/5.0)*0.09
-            return "High", val
-        elif r <= 20:
-            # 0.6 - 0.7
-            val = 0.6 + ((21-r)/5.0)*0.09
-            return "Medium", val
-        elif r <= 25:
-            # 0.5 - 0.6
-            val = 0.5 + ((26-r)/5.0)*0.09
-            return "Low", val
-        else:
-            # Fallback for > 25 (Low/Safe)
-            return "Low", 0.4
+    if cache is None:
+        ranked = _score_complaints(complaints, snapshot, bundle, top_k)
+        SCORED_COMPLAINTS.inc("bypass", amount=len(complaints))
+    else:
+        cache.sync(bundle["version"], snapshot.version)
+        keys = [_cache_key(c, snapshot, bundle, top_k) for c in complaints]
+        ranked = [cache.get(key) for key in keys]
+        pending = [i for i, r in enumerate(ranked) if r is None]
+        SCORED_COMPLAINTS.inc("hit", amount=len(complaints) - len(pending))
+        SCORED_COMPLAINTS.inc("miss", amount=len(pending))
+        if pending:
+            scored = _score_complaints([complaints[i] for i in pending], snapshot, bundle, top_k)
+            for i, (atm_rows, scores) in zip(pending, scored):
+                ranked[i] = (read_only(atm_rows), read_only(scores))
+                cache.put(keys[i], ranked[i])
+
+    # --- Rank-based risk classes + display columns for the selected rows ---
+    with metrics.stage("classify"):
+        return [
+            ranking_frame(complaint, snapshot, atm_rows, scores)
+            for complaint, (atm_rows, scores) in zip(complaints, ranked)
+        ]
+
+
+def predict_atm_risk_batch(complaints, top_k=None):
+    """
+    Rank ATMs for many complaints with a single model call.
+
+    Every complaint's candidate rows are written into one stacked feature
+    matrix, scored by one `model.predict`, and split back per complaint.
+    Rankings already in the prediction cache (same model inputs, bundle
+    and ATM snapshot) skip scoring entirely. Returns one result frame per
+    complaint, in input order (same layout and top_k semantics as
+    predict_atm_risk).
+    """
+    from backend.prediction_cache import prediction_cache
 
-    # Apply valid logic
-    res = full_df.apply(classify_and_score, axis=1, result_type='expand')
-    full_df["risk_class"] = res[0]
-    full_df["risk_score_norm"] = res[1]
+    if not complaints:
+        return []
 
-    # --- Build complaint_text including timestamp (for UI alerts) ---
-    # (same text repeated for each row; frontend can just use the first row)
-    full_df["complaint_text"] = (
-        "Complaint received on "
-        + full_df["complaint_timestamp"].astype(str)
-        + " from "
-        + full_df["victim_village"].astype(str)
-        + ", "
-        + full_df["victim_taluka"].astype(str)
-        + ", "
-        + full_df["victim_district"].astype(str)
-        + ". Fraud type: "
-        + full_df["fraud_type"].astype(str)
-        + ", Bank: "
-        + full_df["bank_name"].astype(str)
-        + "."
-    )
+    # --- ATM master: shared, read-only snapshot (rebuilt only on reseed) ---
+    from backend.atm_snapshot import atm_snapshots
+
+    with metrics.stage("snapshot"):
+        snapshot = atm_snapshots.get()
+
+    # --- Model bundle (process-resident; pinned for this whole call) ---
+    with metrics.stage("bundle"):
+        bundle = model_registry.get()
 
-    result = full_df[[
-        "atm_id",
-        "atm_name_display",
-        "atm_place_display",
-        "atm_lat",
-        "atm_lon",
-        "risk_score_raw",
-        "risk_score_norm",
-        "risk_class",
-        "atm_total_complaints",
-        "atm_avg_loss",
-        "rank_order",
-        "complaint_timestamp",
-        "complaint_text",
-    ]]
-
-    return result
+    return rank_complaints(complaints, snapshot, bundle, top_k, cache=prediction_cache)
 
 
 if __name__ == "__main__":
@@ -262,7 +458,7 @@ if __name__ == "__main__":
         "linked_fraud_ring": "Ring_B",
     }
 
-    df_pred = predict_atm_risk(complaint_example)
+    df_pred = predict_atm_risk(complaint_example, top_k=None)
 
     print("\n====== TOP 10 PREDICTED ATMs ======")
     print(df_pred.head(10))
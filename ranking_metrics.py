@@ -0,0 +1,51 @@
+"""
+Ranking metrics over query groups (one group = one complaint's candidate
+ATMs), shared by tune_ranker.py and the prediction benchmarks.
+
+Rows are laid out as for LightGBM: each group is a contiguous run whose
+length is given in `group_sizes`. Groups without any relevant row are
+skipped, since NDCG, MRR and recall are undefined for them.
+"""
+import numpy as np
+
+
+def group_offsets(group_sizes):
+    return np.concatenate(([0], np.cumsum(np.asarray(group_sizes, dtype=np.int64))))
+
+
+def ranking_metrics(labels, scores, group_sizes, ndcg_at=(5, 10), recall_at=(50,)):
+    """
+    Mean NDCG@k, MRR and recall@k over groups.
+    Returns {"ndcg@5": ..., "mrr": ..., "recall@50": ..., "groups": n}.
+    """
+    labels = np.asarray(labels, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    offsets = group_offsets(group_sizes)
+    max_k = max(max(ndcg_at, default=0), 1)
+    discounts = 1.0 / np.log2(np.arange(2, max_k + 2))
+
+    sums = {f"ndcg@{k}": 0.0 for k in ndcg_at}
+    sums.update({f"recall@{k}": 0.0 for k in recall_at})
+    sums["mrr"] = 0.0
+    groups = 0
+
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        rel = labels[start:end]
+        n_relevant = np.count_nonzero(rel > 0)
+        if n_relevant == 0:
+            continue
+        groups += 1
+        ranked = rel[np.argsort(-scores[start:end], kind="stable")]
+        ideal = np.sort(rel)[::-1]
+        gains, ideal_gains = 2.0 ** ranked - 1.0, 2.0 ** ideal - 1.0
+        for k in ndcg_at:
+            kk = min(k, len(rel))
+            idcg = float(ideal_gains[:kk] @ discounts[:kk])
+            sums[f"ndcg@{k}"] += float(gains[:kk] @ discounts[:kk]) / idcg if idcg > 0 else 0.0
+        sums["mrr"] += 1.0 / (int(np.argmax(ranked > 0)) + 1)
+        for k in recall_at:
+            sums[f"recall@{k}"] += np.count_nonzero(ranked[:k] > 0) / n_relevant
+
+    metrics = {name: (total / groups if groups else float("nan")) for name, total in sums.items()}
+    metrics["groups"] = groups
+    return metrics
@@ -17,6 +17,21 @@ export async function fetchAtmHotspotsForComplaint(complaint) {
   return res.data; // { [complaint_id]: [ATMRisk, ...] }
 }
 
+// Score many complaints in one request (single model call on the backend)
+export async function fetchAtmHotspotsForComplaints(complaints, topK = 50) {
+  const payload = complaints.map((complaint) => ({
+    ...complaint,
+    time_of_complaint: complaint.complaint_timestamp || new Date().toISOString(),
+  }));
+
+  const res = await axios.post(
+    `${API_BASE_URL}/api/complaints/atm-hotspots:batch`,
+    payload,
+    { params: { top_k: topK } }
+  );
+  return res.data; // { [complaint_id]: [ATMRisk, ...], ... }
+}
+
 // Fetch all complaints
 export const fetchAllComplaints = async () => {
   const response = await fetch(`${API_BASE_URL}/api/complaints`);
@@ -26,11 +41,40 @@ export const fetchAllComplaints = async () => {
   return response.json();
 };
 
-// Fetch history complaints
-export const fetchHistoryComplaints = async () => {
-  const response = await fetch(`${API_BASE_URL}/api/history`);
+// Fetch history complaints; params: status, district, fraud_type, bank,
+// date_from, date_to, sort, order, limit, cursor (all optional)
+export const fetchHistoryComplaints = async (params = {}) => {
+  return (await fetchHistoryPage(params)).items;
+};
+
+// One page of history complaints plus the cursor for the next page
+// (null on the last page); pass it back as params.cursor
+export const fetchHistoryPage = async (params = {}) => {
+  const query = new URLSearchParams(params).toString();
+  const response = await fetch(`${API_BASE_URL}/api/history${query ? `?${query}` : ""}`);
   if (!response.ok) {
     throw new Error("Failed to fetch history complaints");
   }
-  return response.json();
+  return {
+    items: await response.json(),
+    nextCursor: response.headers.get("X-Next-Cursor"),
+  };
+};
+
+// Move many complaints to history in one request
+export async function archiveComplaints(complaintIds) {
+  const res = await axios.post(`${API_BASE_URL}/api/complaints/archive`, {
+    complaint_ids: complaintIds,
+  });
+  return res.data; // { archived: [...], already_archived: [...], not_found: [...], status }
+}
+
+// Count history complaints matching the same filters
+export const countHistoryComplaints = async (params = {}) => {
+  const query = new URLSearchParams(params).toString();
+  const response = await fetch(`${API_BASE_URL}/api/history/count${query ? `?${query}` : ""}`);
+  if (!response.ok) {
+    throw new Error("Failed to count history complaints");
+  }
+  return (await response.json()).count;
 };
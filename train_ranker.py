@@ -1,17 +1,101 @@
-import pandas as pd
-import numpy as np
+import argparse
+import os
 import pickle
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 import lightgbm as lgb
 
+import feature_store
+import pair_cache
+from distance import LEGACY_METHOD, METHODS, pairwise_distance_km
+
 TRAIN_DATA_PATH = "cipher_rank_pairs.csv"   # your pairs dataset
 BUNDLE_PATH = "cipher_ranker_bundle.pkl"    # saved model+
+# Formula for victim_atm_distance_km; stored in the bundle so serving matches
+DISTANCE_METHOD = os.getenv("DISTANCE_METHOD", LEGACY_METHOD)
+CACHE_DIR = "rank_pairs_cache"              # out-of-core encoded pairs
+
+LABEL_COL = "label"
+GROUP_COL = "complaint_id"
+
+# --- Define features explicitly (NO cluster_id) ---
+CANDIDATE_FEATURE_COLS = [
+    # Complaint-level features
+    "victim_state",
+    "victim_district",
+    "victim_taluka",
+    "victim_village",
+    "victim_pincode",
+    "victim_rural_urban",
+    "victim_lat",
+    "victim_lon",
+    "channel",
+    "fraud_type",
+    "bank_name",
+    "reported_loss_amount",
+    "num_transactions",
+    "device_type",
+    "is_otp_shared",
+    "clicked_malicious_link",
+    "urgency_score",
+    "account_age_months",
+    "prior_complaints_same_upi",
+    "linked_fraud_ring",
+
+    # ATM-level features
+    "atm_id",
+    "suspected_atm_name",
+    "suspected_atm_place",
+    "atm_lat",
+    "atm_lon",
+    "atm_bank_name",
+    "atm_total_complaints",
+    "atm_cashout_rate",
+    "atm_avg_loss",
+    "victim_atm_distance_km",
+]
+
 
+# Categorical columns (subset of features)
+CATEGORICAL_COLS = [
+    "victim_state",
+    "victim_district",
+    "victim_taluka",
+    "victim_village",
+    "victim_rural_urban",
+    "channel",
+    "fraud_type",
+    "device_type",
+    "linked_fraud_ring",
+    "bank_name",
+    "suspected_atm_name",
+    "suspected_atm_place",
+    "atm_bank_name",
+]
 
-def main():
-    print(f"[LOAD] Reading training data from {TRAIN_DATA_PATH} ...")
-    df = pd.read_csv(TRAIN_DATA_PATH)
+RANKER_PARAMS = {
+    "objective": "lambdarank",
+    "n_estimators": 200,
+    "learning_rate": 0.05,
+    "num_leaves": 63,
+    "random_state": 42,
+}
+
+
+def load_training_frame(data_path=TRAIN_DATA_PATH, states=None, months=None):
+    """
+    Read the pairs source (only the `states` / `months` partitions of a
+    store dataset when given), recompute the distance feature and
+    label-encode the categoricals in place. Returns (df, feature_cols,
+    categorical_cols, encoders); shared with tune_ranker.py.
+    """
+    print(f"[LOAD] Reading training data from {data_path} ...")
+    # Only the columns training can use (pruned at read time for the store)
+    needed = set(CANDIDATE_FEATURE_COLS) | {LABEL_COL, GROUP_COL} | set(pair_cache.COORD_COLS)
+    df = feature_store.read_frame(
+        data_path, columns=[c for c in feature_store.columns_of(data_path) if c in needed],
+        filter=feature_store.source_filter(data_path, states, months),
+    )
     print("[LOAD] Shape:", df.shape)
 
     # --- Basic sanity checks ---
@@ -21,78 +105,44 @@ def main():
     if "complaint_id" not in df.columns:
         raise ValueError("Expected a 'complaint_id' column for grouping.")
 
-    label_col = "label"
-    group_col = "complaint_id"
-
-    # --- Define features explicitly (NO cluster_id) ---
-    candidate_feature_cols = [
-        # Complaint-level features
-        "victim_state",
-        "victim_district",
-        "victim_taluka",
-        "victim_village",
-        "victim_pincode",
-        "victim_rural_urban",
-        "victim_lat",
-        "victim_lon",
-        "channel",
-        "fraud_type",
-        "bank_name",
-        "reported_loss_amount",
-        "num_transactions",
-        "device_type",
-        "is_otp_shared",
-        "clicked_malicious_link",
-        "urgency_score",
-        "account_age_months",
-        "prior_complaints_same_upi",
-        "linked_fraud_ring",
-
-        # ATM-level features
-        "atm_id",
-        "suspected_atm_name",
-        "suspected_atm_place",
-        "atm_lat",
-        "atm_lon",
-        "atm_bank_name",
-        "atm_total_complaints",
-        "atm_cashout_rate",
-        "atm_avg_loss",
-        "victim_atm_distance_km",
-    ]
+    # --- Recompute victim_atm_distance_km with the serving kernel ---
+    if DISTANCE_METHOD not in METHODS:
+        raise ValueError(f"DISTANCE_METHOD must be one of {METHODS}, got {DISTANCE_METHOD!r}")
+    if {"victim_lat", "victim_lon", "atm_lat", "atm_lon"}.issubset(df.columns):
+        df["victim_atm_distance_km"] = pairwise_distance_km(
+            df["victim_lat"].to_numpy(dtype=float),
+            df["victim_lon"].to_numpy(dtype=float),
+            df["atm_lat"].to_numpy(dtype=float),
+            df["atm_lon"].to_numpy(dtype=float),
+            method=DISTANCE_METHOD,
+        )
+        print(f"[FEATURE] victim_atm_distance_km computed with the {DISTANCE_METHOD} kernel")
 
     # Keep only those that truly exist
-    feature_cols = [c for c in candidate_feature_cols if c in df.columns]
+    feature_cols = [c for c in CANDIDATE_FEATURE_COLS if c in df.columns]
     print("[INFO] Using", len(feature_cols), "features:")
     for c in feature_cols:
         print("  -", c)
 
-    # Categorical columns (subset of features)
-    categorical_cols = [
-        "victim_state",
-        "victim_district",
-        "victim_taluka",
-        "victim_village",
-        "victim_rural_urban",
-        "channel",
-        "fraud_type",
-        "device_type",
-        "linked_fraud_ring",
-        "bank_name",
-        "suspected_atm_name",
-        "suspected_atm_place",
-        "atm_bank_name",
-    ]
-    categorical_cols = [c for c in categorical_cols if c in feature_cols]
+    categorical_cols = [c for c in CATEGORICAL_COLS if c in feature_cols]
 
     # --- Encode categorical features ---
     encoders = {}
     for col in categorical_cols:
         le = LabelEncoder()
-        df[col] = le.fit_transform(df[col].astype(str))
+        df[col] = le.fit_transform(pair_cache.category_strings(df[col]))
         encoders[col] = le
         print(f"[ENCODE] {col} -> {len(le.classes_)} classes")
 
+    return df, feature_cols, categorical_cols, encoders
+
+
+def train_in_memory(data_path=TRAIN_DATA_PATH, bundle_path=BUNDLE_PATH, states=None, months=None):
+    """Original mode: the whole pairs source (or training window) as one DataFrame."""
+    df, feature_cols, categorical_cols, encoders = load_training_frame(data_path, states, months)
+    label_col = LABEL_COL
+    group_col = GROUP_COL
+
     # --- Train/test split by complaint_id (group-aware) ---
     complaint_ids = df[group_col].unique()
     train_ids, test_ids = train_test_split(
@@ -117,13 +167,7 @@ def main():
     train_group = train_df.groupby(group_col).size().values
 
     # --- Train LightGBM Ranker ---
-    ranker = lgb.LGBMRanker(
-        objective="lambdarank",
-        n_estimators=200,
-        learning_rate=0.05,
-        num_leaves=63,
-        random_state=42,
-    )
+    ranker = lgb.LGBMRanker(**RANKER_PARAMS)
 
     print("[TRAIN] Training LightGBM Ranker ...")
     ranker.fit(
@@ -137,18 +181,127 @@ def main():
     print("[EVAL] Mean score (label=1):", y_pred_test[y_test == 1].mean())
     print("[EVAL] Mean score (label=0):", y_pred_test[y_test == 0].mean())
 
+    save_bundle(ranker, feature_cols, categorical_cols, encoders, bundle_path)
+
+
+def save_bundle(model, feature_cols, categorical_cols, encoders, bundle_path=BUNDLE_PATH):
     # --- Save bundle (model + encoders + feature list) ---
     bundle = {
-        "model": ranker,
+        "model": model,
         "feature_cols": feature_cols,
         "categorical_cols": categorical_cols,
         "encoders": encoders,
+        "distance_method": DISTANCE_METHOD,
     }
 
-    with open(BUNDLE_PATH, "wb") as f:
+    with open(bundle_path, "wb") as f:
         pickle.dump(bundle, f)
 
-    print(f"[SAVE] Saved ranker bundle to {BUNDLE_PATH}")
+    print(f"[SAVE] Saved ranker bundle to {bundle_path}")
+
+
+def train_out_of_core(data_path=TRAIN_DATA_PATH, bundle_path=BUNDLE_PATH, cache_dir=CACHE_DIR,
+                      chunk_rows=200_000, rebuild_cache=False, test_size=0.2, states=None, months=None):
+    """
+    Streaming mode: pairs are encoded once into the columnar cache in
+    `cache_dir` (see pair_cache.py) and LightGBM reads them back through
+    memory-mapped Sequences / a saved binary Dataset. Retrains on an
+    unchanged CSV skip straight to boosting.
+
+    The split hashes complaint_id instead of train_test_split over all ids,
+    so test membership differs from the in-memory mode. The saved model is
+    a lgb.Booster; predict.py only needs .predict().
+    """
+    if DISTANCE_METHOD not in METHODS:
+        raise ValueError(f"DISTANCE_METHOD must be one of {METHODS}, got {DISTANCE_METHOD!r}")
+
+    header = set(feature_store.columns_of(data_path))
+    if LABEL_COL not in header:
+        raise ValueError("Expected a 'label' column (1 for true ATM, 0 for others).")
+    if GROUP_COL not in header:
+        raise ValueError("Expected a 'complaint_id' column for grouping.")
+    if set(pair_cache.COORD_COLS).issubset(header):
+        header.add(pair_cache.DISTANCE_COL)
+
+    feature_cols = [c for c in CANDIDATE_FEATURE_COLS if c in header]
+    categorical_cols = [c for c in CATEGORICAL_COLS if c in feature_cols]
+    print("[INFO] Using", len(feature_cols), "features:")
+    for c in feature_cols:
+        print("  -", c)
+
+    options = pair_cache.cache_options(DISTANCE_METHOD, test_size, states, months)
+    manifest = pair_cache.load_manifest(cache_dir)
+    if (rebuild_cache
+            or not pair_cache.cache_is_current(manifest, pair_cache.source_signature(data_path), options)
+            or manifest["feature_cols"] != feature_cols):
+        manifest = pair_cache.build_cache(
+            data_path, cache_dir, feature_cols, categorical_cols, LABEL_COL, GROUP_COL,
+            DISTANCE_METHOD, test_size, chunk_rows, states, months,
+        )
+    else:
+        print(f"[CACHE] Reusing {cache_dir} ({manifest['rows']['train']:,} train rows)")
+    encoders = pair_cache.load_encoders(cache_dir)
+
+    print("[SPLIT] Train rows:", manifest["rows"]["train"])
+    print("[SPLIT] Test rows :", manifest["rows"]["test"])
+
+    params = {
+        "objective": RANKER_PARAMS["objective"],
+        "learning_rate": RANKER_PARAMS["learning_rate"],
+        "num_leaves": RANKER_PARAMS["num_leaves"],
+        "seed": RANKER_PARAMS["random_state"],
+        "verbose": -1,
+    }
+    train_set = pair_cache.train_dataset(cache_dir, manifest, chunk_rows)
+
+    print("[TRAIN] Training LightGBM Ranker (out-of-core) ...")
+    booster = lgb.train(params, train_set, num_boost_round=RANKER_PARAMS["n_estimators"])
+
+    # Simple sanity eval, accumulated part by part
+    sums = {0: [0.0, 0], 1: [0.0, 0]}
+    for X_part, y_part in pair_cache.iter_split(cache_dir, manifest, "test"):
+        pred = booster.predict(X_part)
+        for label in (0, 1):
+            mask = y_part == label
+            sums[label][0] += float(pred[mask].sum())
+            sums[label][1] += int(mask.sum())
+    for label in (1, 0):
+        total, count = sums[label]
+        print(f"[EVAL] Mean score (label={label}):", total / count if count else float("nan"))
+
+    save_bundle(booster, feature_cols, categorical_cols, encoders, bundle_path)
+
+
+def add_window_arguments(parser):
+    """--states / --months: train on those feature-store partitions only."""
+    parser.add_argument("--states", nargs="+", default=None,
+                        help="victim_state partitions to read (feature store only)")
+    parser.add_argument("--months", nargs="+", default=None,
+                        help="month partitions (YYYY-MM) to read, e.g. the training window (feature store only)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the CIPHER ATM ranker.")
+    parser.add_argument("--data", default=None,
+                        help="rank pairs CSV or feature-store dataset "
+                             "(default: the feature store if built, else the CSV)")
+    parser.add_argument("--bundle", default=BUNDLE_PATH, help="output bundle pickle")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="stream the CSV through an on-disk columnar cache")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--chunk-rows", type=int, default=200_000)
+    parser.add_argument("--rebuild-cache", action="store_true")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    add_window_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.data is None:
+        args.data = feature_store.resolve_source(TRAIN_DATA_PATH, feature_store.RANK_PAIRS)
+
+    if args.out_of_core:
+        train_out_of_core(args.data, args.bundle, args.cache_dir, args.chunk_rows,
+                          args.rebuild_cache, args.test_size, args.states, args.months)
+    else:
+        train_in_memory(args.data, args.bundle, args.states, args.months)
 
 
 if __name__ == "__main__":
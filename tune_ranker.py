@@ -0,0 +1,254 @@
+"""
+Hyperparameter search for the ATM ranker.
+
+Each candidate configuration is evaluated with grouped K-fold CV over
+complaint_id (NDCG@5/10, MRR, recall@50, see ranking_metrics.py), using
+early stopping on the held-out fold. Configurations run in parallel in a
+process pool. The cores are split between the workers: each LightGBM
+gets num_threads = n_jobs // workers, so the workers don't oversubscribe
+the CPU.
+
+The encoded training matrix is written once to a temp directory as .npy
+and memory-mapped by every worker, so it is neither re-parsed nor
+pickled per task. Each worker bins it once into a LightGBM Dataset and
+trains every fold on row subsets of that Dataset, so no fold copies X;
+only the validation rows are read back for prediction.
+
+Results go next to the bundle: <bundle>_tuning.csv (one row per config,
+best first) and <bundle>_tuning.json (best params + rounds). With
+--refit, the best configuration is retrained on all pairs and saved as
+the bundle.
+
+    python tune_ranker.py --n-configs 20 --folds 5 --n-jobs 16 --refit
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import GroupKFold
+
+import feature_store
+import train_ranker
+from ranking_metrics import ranking_metrics
+
+PRIMARY_METRIC = "ndcg@10"
+
+# Search space; the current production config is always evaluated first
+SEARCH_SPACE = {
+    "num_leaves": [15, 31, 63, 127],
+    "learning_rate": [0.02, 0.05, 0.1],
+    "min_child_samples": [10, 20, 50, 100],
+    "feature_fraction": [0.7, 0.85, 1.0],
+    "bagging_fraction": [0.7, 0.85, 1.0],
+    "lambda_l2": [0.0, 1.0, 10.0],
+}
+BASELINE = {
+    "num_leaves": train_ranker.RANKER_PARAMS["num_leaves"],
+    "learning_rate": train_ranker.RANKER_PARAMS["learning_rate"],
+    "min_child_samples": 20,
+    "feature_fraction": 1.0,
+    "bagging_fraction": 1.0,
+    "lambda_l2": 0.0,
+}
+
+# Per-worker state, set by _init_worker
+_DATA = {}
+
+
+def sample_configs(n, seed=42):
+    """Baseline + up to n-1 distinct random configurations."""
+    rng = random.Random(seed)
+    configs = [dict(BASELINE)]
+    seen = {tuple(sorted(BASELINE.items()))}
+    space_size = int(np.prod([len(v) for v in SEARCH_SPACE.values()]))
+    while len(configs) < min(n, space_size):
+        config = {name: rng.choice(values) for name, values in SEARCH_SPACE.items()}
+        key = tuple(sorted(config.items()))
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def _run_lengths(codes):
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    return np.diff(np.r_[starts, len(codes)])
+
+
+def _init_worker(data_dir, num_threads, seed=42):
+    _DATA["X"] = np.load(os.path.join(data_dir, "X.npy"), mmap_mode="r")
+    _DATA["y"] = np.load(os.path.join(data_dir, "y.npy"), mmap_mode="r")
+    _DATA["groups"] = np.load(os.path.join(data_dir, "groups.npy"), mmap_mode="r")
+    _DATA["fold_of"] = np.load(os.path.join(data_dir, "fold_of.npy"), mmap_mode="r")
+    _DATA["num_threads"] = num_threads
+    _DATA["seed"] = seed
+    _DATA["dataset"] = binned_dataset(_DATA["X"], _DATA["y"], _DATA["groups"], num_threads, seed)
+
+
+def binned_dataset(X, y, groups, num_threads, seed=42):
+    """
+    All pairs binned once; folds train on Dataset.subset() of it. Pre-filter
+    is off so configs may lower min_child_samples without re-binning.
+    """
+    params = {"feature_pre_filter": False, "seed": seed, "num_threads": num_threads, "verbose": -1}
+    return lgb.Dataset(X, label=y, group=_run_lengths(groups), params=params).construct()
+
+
+def lgb_params(config, num_threads, seed=42):
+    params = {
+        "objective": "lambdarank",
+        "metric": "ndcg",
+        "eval_at": [10],
+        "seed": seed,
+        "num_threads": num_threads,
+        "verbose": -1,
+        **config,
+    }
+    if params["bagging_fraction"] < 1.0:
+        params["bagging_freq"] = 1
+    return params
+
+
+def evaluate_config(index, config, max_rounds, early_stopping):
+    """Grouped K-fold CV of one configuration (runs in a worker)."""
+    started = time.perf_counter()
+    X, y, groups, full = _DATA["X"], _DATA["y"], _DATA["groups"], _DATA["dataset"]
+    # same seed as the binned Dataset, which LightGBM checks on reuse
+    params = lgb_params(config, _DATA["num_threads"], _DATA["seed"])
+    fold_metrics, rounds = [], []
+
+    fold_of = np.asarray(_DATA["fold_of"])
+    for fold in range(int(fold_of.max()) + 1):
+        # sorted row indices keep each complaint's rows contiguous, so the
+        # subsets carry whole queries (labels and groups come from `full`)
+        train_idx = np.flatnonzero(fold_of != fold)
+        valid_idx = np.flatnonzero(fold_of == fold)
+        train_set = full.subset(train_idx)
+        valid_group = _run_lengths(groups[valid_idx])
+        valid_set = full.subset(valid_idx)
+        booster = lgb.train(
+            params, train_set, num_boost_round=max_rounds, valid_sets=[valid_set],
+            callbacks=[lgb.early_stopping(early_stopping, verbose=False)],
+        )
+        scores = booster.predict(X[valid_idx], num_iteration=booster.best_iteration)
+        fold_metrics.append(ranking_metrics(y[valid_idx], scores, valid_group))
+        rounds.append(booster.best_iteration or max_rounds)
+
+    row = {"config": index, **config}
+    for name in fold_metrics[0]:
+        if name == "groups":
+            continue
+        values = [m[name] for m in fold_metrics]
+        row[f"{name}_mean"] = float(np.mean(values))
+        row[f"{name}_std"] = float(np.std(values))
+    row["best_rounds"] = int(round(np.mean(rounds)))
+    row["seconds"] = time.perf_counter() - started
+    return row
+
+
+def grouped_fold_ids(groups, n_folds):
+    """Validation fold of every row; all rows of a complaint share a fold."""
+    fold_of = np.empty(len(groups), dtype=np.int8)
+    for fold, (_, valid_idx) in enumerate(GroupKFold(n_splits=n_folds).split(groups, groups=groups)):
+        fold_of[valid_idx] = fold
+    return fold_of
+
+
+def results_paths(bundle_path):
+    stem = os.path.splitext(bundle_path)[0]
+    return f"{stem}_tuning.csv", f"{stem}_tuning.json"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grouped-CV hyperparameter search for the ATM ranker.")
+    parser.add_argument("--data", default=None, help="rank pairs CSV or feature-store dataset")
+    parser.add_argument("--bundle", default=train_ranker.BUNDLE_PATH)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--n-configs", type=int, default=20)
+    parser.add_argument("--n-jobs", type=int, default=os.cpu_count() or 1,
+                        help="total cores shared by all workers")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="parallel configurations (0 = half of n-jobs, at most n-configs)")
+    parser.add_argument("--max-rounds", type=int, default=1000)
+    parser.add_argument("--early-stopping", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--refit", action="store_true",
+                        help="retrain the best config on all pairs and save the bundle")
+    train_ranker.add_window_arguments(parser)
+    args = parser.parse_args(argv)
+    data_path = args.data or feature_store.resolve_source(train_ranker.TRAIN_DATA_PATH, feature_store.RANK_PAIRS)
+
+    df, feature_cols, categorical_cols, encoders = train_ranker.load_training_frame(data_path, args.states, args.months)
+    # LightGBM needs each complaint's rows contiguous
+    df = df.sort_values(train_ranker.GROUP_COL, kind="stable")
+    X = df[feature_cols].to_numpy(dtype=np.float64)
+    y = df[train_ranker.LABEL_COL].to_numpy(dtype=np.float64)
+    groups = pd.factorize(df[train_ranker.GROUP_COL])[0].astype(np.int64)
+    del df
+
+    configs = sample_configs(args.n_configs, args.seed)
+    workers = args.workers or max(1, min(len(configs), args.n_jobs // 2))
+    num_threads = max(1, args.n_jobs // workers)
+    print(f"[TUNE] {len(configs)} configs x {args.folds} folds on {len(y):,} pairs; "
+          f"{workers} workers x {num_threads} LightGBM threads")
+
+    started = time.perf_counter()
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="tune_ranker_") as data_dir:
+        np.save(os.path.join(data_dir, "X.npy"), X)
+        np.save(os.path.join(data_dir, "y.npy"), y)
+        np.save(os.path.join(data_dir, "groups.npy"), groups)
+        np.save(os.path.join(data_dir, "fold_of.npy"), grouped_fold_ids(groups, args.folds))
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(data_dir, num_threads, args.seed)) as pool:
+            futures = [pool.submit(evaluate_config, i, config, args.max_rounds, args.early_stopping)
+                       for i, config in enumerate(configs)]
+            for future in as_completed(futures):
+                row = future.result()
+                rows.append(row)
+                print(f"[TUNE] config {row['config']}: {PRIMARY_METRIC}={row[f'{PRIMARY_METRIC}_mean']:.4f} "
+                      f"mrr={row['mrr_mean']:.4f} recall@50={row['recall@50_mean']:.4f} "
+                      f"rounds={row['best_rounds']} ({row['seconds']:.1f}s)")
+
+    results = pd.DataFrame(rows).sort_values(f"{PRIMARY_METRIC}_mean", ascending=False)
+    csv_path, json_path = results_paths(args.bundle)
+    results.to_csv(csv_path, index=False)
+    best = results.iloc[0]
+    best_config = {name: best[name].item() if hasattr(best[name], "item") else best[name] for name in SEARCH_SPACE}
+    summary = {
+        "primary_metric": PRIMARY_METRIC,
+        "best_config": best_config,
+        "best_rounds": int(best["best_rounds"]),
+        "metrics": {c: float(best[c]) for c in results.columns if c.endswith("_mean")},
+        "folds": args.folds,
+        "configs": len(configs),
+        "data": data_path,
+        "states": args.states,
+        "months": args.months,
+        "seconds": time.perf_counter() - started,
+    }
+    with open(json_path, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(results.head(10).to_string(index=False))
+    print(f"[SAVE] Tuning results -> {csv_path}, {json_path}")
+
+    if args.refit:
+        print(f"[TRAIN] Refitting best config on all {len(y):,} pairs ...")
+        booster = lgb.train(
+            lgb_params(best_config, args.n_jobs, args.seed),
+            lgb.Dataset(X, label=y, group=_run_lengths(groups)),
+            num_boost_round=summary["best_rounds"],
+        )
+        train_ranker.save_bundle(booster, feature_cols, categorical_cols, encoders, args.bundle)
+
+
+if __name__ == "__main__":
+    main()
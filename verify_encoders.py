@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+import pair_cache
+
+# The in-memory trainer (train_ranker.load_training_frame) and the
+# --out-of-core cache (pair_cache.scan_vocabulary / encode_chunk) must agree
+# on the classes of a categorical column that has missing values.
+csv = "channel,fraud_type\nUPI,Phishing\n,Vishing\nCard,\nUPI,Phishing\n"
+path = os.path.join(tempfile.mkdtemp(), "pairs.csv")
+with open(path, "w") as f:
+    f.write(csv)
+
+cols = ["channel", "fraud_type"]
+df = pd.read_csv(path)
+try:
+    encoders = pair_cache.scan_vocabulary(path, cols, chunk_rows=2)
+    ok = True
+    for col in cols:
+        in_memory = LabelEncoder()
+        codes = in_memory.fit_transform(pair_cache.category_strings(df[col]))
+        out_of_core = encoders[col]
+        same_classes = list(in_memory.classes_) == list(out_of_core.classes_)
+        same_codes = np.array_equal(codes, pair_cache._encode_strings(df[col], out_of_core.classes_))
+        print(f"{col}: in-memory {list(in_memory.classes_)} | out-of-core {list(out_of_core.classes_)}")
+        ok = ok and same_classes and same_codes
+    print("PASS" if ok else "FAIL: encoders differ")
+except Exception as e:
+    import traceback
+    traceback.print_exc()
+    print("FAIL:", e)